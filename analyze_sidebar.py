@@ -1,21 +1,39 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
 import sys
 import io
 
+# Selectors compiled once; TOCLINK runs inside the sibling loop
+ONBOARDING = sv.compile('a[href="/onboarding-tutorial"]')
+ANCHOR = sv.compile('a')
+TOCLINK = sv.compile('a[class*="toclink"]')
+
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 filename = "sidebar_debug.html"
 print(f"Analyzing {filename}...")
 
+# Only materialize the list/link containers the checks below inspect
+strainer = SoupStrainer(['a', 'div', 'li', 'ul'])
 with open(filename, 'r', encoding='utf-8') as f:
-    soup = BeautifulSoup(f, 'html.parser')
+    soup = BeautifulSoup(f, 'lxml', parse_only=strainer)
+
+# Index anchors by text once instead of walking the tree per lookup
+anchors_by_text = {}
+for a in ANCHOR.select(soup):
+    anchors_by_text.setdefault(a.get_text(strip=True), a)
+
+def find_anchor(text):
+    if text in anchors_by_text:
+        return anchors_by_text[text]
+    return next((a for t, a in anchors_by_text.items() if text in t), None)
 
 # 1. Find Onboarding
-onboarding = soup.select_one('a[href="/onboarding-tutorial"]')
+onboarding = ONBOARDING.select_one(soup)
 if not onboarding:
     print("❌ Onboarding link NOT FOUND (href match failed)")
     # Try text match
-    onboarding = soup.find(lambda t: t.name == 'a' and 'Onboarding Tutorial' in t.text)
+    onboarding = find_anchor('Onboarding Tutorial')
     if not onboarding:
         print("❌ Onboarding link NOT FOUND (text match failed)")
         sys.exit(1)
@@ -35,7 +53,7 @@ while curr and count < 5:
         found_div = True
         print("  --> THIS IS THE DIV WE WANT!")
         # Check children of div
-        children = curr.select('a[class*="toclink"]')
+        children = TOCLINK.select(curr)
         print(f"  --> Found {len(children)} toclinks inside.")
         for c in children:
             print(f"      - {c.get_text(strip=True)}")
@@ -44,7 +62,7 @@ while curr and count < 5:
 
 # 3. Find Bridging
 print("\n--- Bridging Check ---")
-bridging = soup.find(lambda t: t.name == 'a' and 'Bridging USDT0 to Ink' in t.text)
+bridging = find_anchor('Bridging USDT0 to Ink')
 if bridging:
     print(f"✅ Bridging found. Classes: {bridging.get('class')}")
     # 4. Check Parents
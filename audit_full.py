@@ -1,12 +1,19 @@
-import sys
+from audit_runner import run_audit
 
-filename = sys.argv[1]
-print(f"Scanning {filename} for ALL headers...")
-try:
-    with open(filename, 'r', encoding='utf-8') as f:
-        for i, line in enumerate(f):
-            clean = line.strip()
-            if clean.startswith('#'):
-                print(f"Line {i+1}: {clean}")
-except Exception as e:
-    print(f"Error: {e}")
+def scan(filename):
+    """Return (line_no, header) pairs for every markdown header in the file"""
+    hits = []
+    # Scan raw bytes; only the matching header lines get decoded
+    with open(filename, 'rb') as f:
+        for i, raw in enumerate(f):
+            if raw.lstrip()[:1] == b'#':
+                hits.append((i + 1, raw.decode('utf-8', 'replace').strip()))
+    return hits
+
+def report(filename, hits):
+    print(f"Scanning {filename} for ALL headers...")
+    for line_no, clean in hits:
+        print(f"Line {line_no}: {clean}")
+
+if __name__ == "__main__":
+    run_audit(scan, report)
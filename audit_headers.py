@@ -1,15 +1,26 @@
-import sys
+import re
+from audit_runner import run_audit
 
-filename = sys.argv[1]
 targets = ["Onboarding Tutorial", "Bridging USDT0 to Ink", "FAQs", "Get Started", "Place Order", "Developer Resources"]
+# One alternation pass per line instead of a substring scan per target
+target_re = re.compile(b'|'.join(re.escape(t.encode('utf-8')) for t in targets))
 
-print(f"Scanning {filename} for section order...")
-try:
-    with open(filename, 'r', encoding='utf-8') as f:
-        for i, line in enumerate(f):
-            clean = line.strip()
-            for t in targets:
-                if t in clean and clean.startswith('#'):
-                    print(f"Line {i+1}: {clean}")
-except Exception as e:
-    print(f"Error: {e}")
+def scan(filename):
+    """Return (line_no, header) pairs for headers mentioning any target section"""
+    hits = []
+    # Scan raw bytes; only the matching header lines get decoded
+    with open(filename, 'rb') as f:
+        for i, raw in enumerate(f):
+            if raw.lstrip()[:1] != b'#':
+                continue
+            if target_re.search(raw):
+                hits.append((i + 1, raw.decode('utf-8', 'replace').strip()))
+    return hits
+
+def report(filename, hits):
+    print(f"Scanning {filename} for section order...")
+    for line_no, clean in hits:
+        print(f"Line {line_no}: {clean}")
+
+if __name__ == "__main__":
+    run_audit(scan, report)
@@ -0,0 +1,30 @@
+"""
+Audit Runner - Shared command-line driver for the audit_* header scanners
+"""
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+def run_audit(scan, report, filenames=None):
+    """
+    Run `scan(filename)` over the files named on the command line and `report` each result.
+    Several files are scanned in parallel; printing stays in this process so output does
+    not interleave.
+    """
+    filenames = sys.argv[1:] if filenames is None else filenames
+    if not filenames:
+        print(f"Usage: python {sys.argv[0]} FILE [FILE ...]", file=sys.stderr)
+        sys.exit(2)
+    if len(filenames) == 1:
+        try:
+            report(filenames[0], scan(filenames[0]))
+        except Exception as e:
+            print(f"Error: {filenames[0]}: {e}")
+    else:
+        with ProcessPoolExecutor() as executor:
+            futures = [executor.submit(scan, name) for name in filenames]
+            for filename, future in zip(filenames, futures):
+                try:
+                    report(filename, future.result())
+                except Exception as e:
+                    print(f"Error: {filename}: {e}")
@@ -3,52 +3,66 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
+from selenium.common.exceptions import TimeoutException
+import atexit
+import functools
 
-def dump_sidebar():
+@functools.lru_cache(maxsize=1)
+def _get_driver():
+    """Launch headless Chrome once and keep it warm for repeated dumps"""
     options = Options()
     options.add_argument('--headless')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
-    
+    # Return from driver.get() on DOMContentLoaded; the sidebar wait below covers the rest
+    options.page_load_strategy = 'eager'
+
     driver = webdriver.Chrome(options=options)
+    atexit.register(driver.quit)
+    return driver
+
+def dump_sidebar():
+    driver = _get_driver()
+    print("Navigating to Nado docs...")
+    driver.get("https://docs.nado.xyz/")
+    
+    # Wait for sidebar
+    print("Waiting for sidebar...")
     try:
-        print("Navigating to Nado docs...")
-        driver.get("https://docs.nado.xyz/")
-        
-        # Wait for sidebar
-        print("Waiting for sidebar...")
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, "a[href='/onboarding-tutorial']"))
         )
-        
+    except TimeoutException:
+        print("Onboarding link not found; dumping the page as it is")
+    else:
         # Expand Onboarding
         print("Expanding Onboarding Tutorial...")
         onboarding = driver.find_element(By.CSS_SELECTOR, "a[href='/onboarding-tutorial']")
         # Use JS click to be safe
         driver.execute_script("arguments[0].click();", onboarding)
-        time.sleep(2) # Wait for expansion animation
-        
-        # Capture HTML
-        print("Capturing HTML...")
-        # Get the common ancestor for sidebar
-        # Often 'nav' or 'aside' or div with specific class
-        sidebar = driver.execute_script("""
-            // Find common parent of Onboarding
-            const el = document.querySelector("a[href='/onboarding-tutorial']");
-            let p = el.parentElement;
-            while(p && p.tagName !== 'ASIDE' && p.id !== 'table-of-contents') {
-                p = p.parentElement;
-            }
-            return p ? p.outerHTML : document.body.outerHTML;
-        """)
-        
-        with open("sidebar_debug.html", "w", encoding="utf-8") as f:
-            f.write(sidebar)
-        print("Sidebar dumped to sidebar_debug.html")
-            
-    finally:
-        driver.quit()
+        # Wait for the expanded children instead of a fixed animation delay
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "a[href='/onboarding-tutorial'] ~ div a[class*='toclink']"))
+            )
+        except TimeoutException:
+            # e.g. a sidebar without nested toclinks: dump what is there
+            print("No expanded children appeared; dumping the sidebar as it is")
+    
+    # Capture HTML
+    print("Capturing HTML...")
+    # Get the common ancestor for sidebar
+    # Often 'nav' or 'aside' or div with specific class
+    sidebar = driver.execute_script("""
+    // Nearest sidebar ancestor of Onboarding
+    const el = document.querySelector("a[href='/onboarding-tutorial']");
+    const p = el && el.closest("aside, #table-of-contents");
+    return (p || document.body).outerHTML;
+    """)
+    
+    with open("sidebar_debug.html", "w", encoding="utf-8") as f:
+        f.write(sidebar)
+    print("Sidebar dumped to sidebar_debug.html")
 
 if __name__ == "__main__":
     dump_sidebar()
@@ -5,6 +5,8 @@ Tries multiple approaches: GitHub cloning → Sitemap parsing → Web scraping
 
 import asyncio
 import aiohttp
+import os
+import re
 import time
 import shutil
 from pathlib import Path
@@ -14,21 +16,31 @@ from strategies.sitemap_strategy import SitemapStrategy
 from strategies.scraping_strategy import ScrapingStrategy
 from utils.content_consolidator import ContentConsolidator
 from utils.asset_downloader import AssetDownloader
+from utils.disk_cache import DiskCache
+from utils.url_utils import normalize_url
 from strategies.hierarchy_manager import HierarchyManager
 from strategies.universal_manager import UniversalManager
 from strategies.fusion_manager import FusionManager
 from strategies.smart_probe import SmartProbe
 
+# First H1 or frontmatter title in the head of a native markdown page
+# (groups come back trimmed and unquoted, so no strip() chain is needed on the hot path)
+_TITLE_RE = re.compile(r'^[ \t]*(?:#[ \t]+(.+?)|title:[ \t]+["\']?(.+?)["\']?)[ \t]*$', re.M)
+
 class GitBookMultiDownloader:
     def __init__(self, url, output_file, strategy='auto', section_path=None, exclude_path=None,
                  max_concurrent=15, delay=0.1, timeout=30, include_assets=False,
-                 keep_temp=False, use_selenium=False, verbose=False):
+                 keep_temp=False, use_selenium=False, verbose=False,
+                 use_cache=True, cache_ttl=86400):
 
         self.url = url.rstrip('/')
         self.output_file = Path(output_file)
         self.strategy = strategy
         self.section_path = section_path
         self.exclude_path = exclude_path
+        # Filters are lowercased/split once here; _should_process runs per discovered URL
+        self._section_lc = section_path.lower() if section_path else None
+        self._exclude_tokens = tuple(tok.strip().lower() for tok in (exclude_path or '').split(',') if tok.strip())
         self.max_concurrent = max_concurrent
         self.delay = delay
         self.timeout = timeout
@@ -36,12 +48,20 @@ class GitBookMultiDownloader:
         self.keep_temp = keep_temp
         self.use_selenium = use_selenium
         self.verbose = verbose
+        self.use_cache = use_cache
+        self.cache_ttl = cache_ttl
+        # Upper bound for a single extract_pages() run so a hung clone/crawl can't stall the
+        # auto race; an explicitly chosen strategy runs to completion
+        self.strategy_timeout = 600
 
         self.logger = get_logger()
 
+        # Probe results, detected repos and clones survive across runs next to the output file
+        self.cache = DiskCache(self.output_file.parent / '.gitbook_cache', ttl=cache_ttl, verbose=verbose) if use_cache else None
+
         # Initialize strategies
         self.strategies = {
-            'github': GitHubStrategy(verbose=verbose),
+            'github': GitHubStrategy(verbose=verbose, cache=self.cache),
             'sitemap': SitemapStrategy(
                 max_concurrent=max_concurrent,
                 delay=delay, 
@@ -62,9 +82,13 @@ class GitBookMultiDownloader:
         self.consolidator = ContentConsolidator(verbose=verbose)
         self.asset_downloader = AssetDownloader(verbose=verbose) if include_assets else None
         self.hierarchy_manager = HierarchyManager(use_selenium=use_selenium, verbose=verbose)
-        self.universal_manager = UniversalManager(use_selenium=use_selenium)
-        self.fusion_manager = FusionManager(use_selenium=use_selenium)
-        self.smart_probe = SmartProbe()
+        self.universal_manager = UniversalManager(use_selenium=use_selenium, cache=self.cache)
+        self.fusion_manager = FusionManager(use_selenium=use_selenium, cache=self.cache)
+        self.smart_probe = SmartProbe(max_concurrent=max_concurrent, delay=delay, cache=self.cache)
+
+        # Progress events are coalesced into one write per interval (seconds)
+        self.progress_interval = 0.05
+        self._pending_progress = None
 
         # Statistics
         self.stats = {
@@ -78,20 +102,38 @@ class GitBookMultiDownloader:
         
     def _should_process(self, url):
         """Check if URL matches include/exclude filters"""
+        u = url.lower()
         # 1. Check Include (section_path)
-        if self.section_path and self.section_path.lower() not in url.lower():
+        if self._section_lc and self._section_lc not in u:
             return False
             
         # 2. Check Exclude
-        if self.exclude_path:
-            excludes = self.exclude_path.split(',')
-            for ex in excludes:
-                if ex.strip() and ex.strip().lower() in url.lower():
-                    return False
-        return True
+        return not any(tok in u for tok in self._exclude_tokens)
 
     def _emit_progress(self, type, data):
         """Emit a structured JSON progress event to stdout for the UI"""
+        if type == 'progress':
+            # Coalesce bursts: only the latest counter within the window is written
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                if self._pending_progress is None:
+                    loop.call_later(self.progress_interval, self._flush_progress)
+                self._pending_progress = data
+                return
+
+        # Keep ordering: a buffered counter goes out before the next stage change
+        self._flush_progress()
+        self._write_sink(type, data)
+
+    def _flush_progress(self):
+        if self._pending_progress is not None:
+            data, self._pending_progress = self._pending_progress, None
+            self._write_sink('progress', data)
+
+    def _write_sink(self, type, data):
         import json
         import sys
         message = json.dumps({"type": type, "data": data})
@@ -99,6 +141,47 @@ class GitBookMultiDownloader:
         print(f"JSON-SINK: {message}")
         sys.stdout.flush()
 
+    async def _race_strategies(self, strategy_order):
+        """Run strategies concurrently, return (name, pages) of the first one that finds pages"""
+        tasks = {}
+        timeout = self.strategy_timeout if len(strategy_order) > 1 else None
+        for strategy_name in strategy_order:
+            self.logger.info(f"🔄 Trying {strategy_name} strategy...")
+            strategy = self.strategies[strategy_name]
+            coro = asyncio.wait_for(
+                strategy.extract_pages(self.url, self.section_path),
+                timeout=timeout
+            )
+            tasks[asyncio.create_task(coro)] = strategy_name
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Several may finish in the same tick - keep the configured preference order
+                for task in sorted(done, key=lambda t: strategy_order.index(tasks[t])):
+                    strategy_name = tasks[task]
+                    try:
+                        pages = task.result()
+                    except asyncio.TimeoutError:
+                        self.logger.warning(f"❌ {strategy_name} strategy timed out after {self.strategy_timeout}s")
+                        continue
+                    except Exception as e:
+                        self.logger.warning(f"❌ {strategy_name} strategy failed: {e}")
+                        continue
+
+                    if pages and len(pages) > 0:
+                        self.logger.info(f"✅ {strategy_name} strategy succeeded - found {len(pages)} pages")
+                        return strategy_name, pages
+                    self.logger.warning(f"⚠️  {strategy_name} strategy found no pages")
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return None, None
+
     async def download(self):
         """Main download method - tries strategies in order"""
         self.stats['start_time'] = time.time()
@@ -174,7 +257,15 @@ class GitBookMultiDownloader:
             # 0.5 Fusion Strategy (Cross-Validation / Hybrid)
             if not pages and self.strategy == 'fusion':
                 self.logger.info("🔥 Fusion Strategy selected. Performing cross-validation discovery...")
-                fusion_nodes = await self.fusion_manager.build_hierarchy(self.url)
+                self._emit_progress("stage", "analyzing")
+
+                # Overlap: start probing sitemap URLs while the sidebar/heuristic discovery is still running
+                fusion_task = asyncio.create_task(self.fusion_manager.build_hierarchy(self.url))
+                seed_urls = [u for u in await self.fusion_manager.seed_urls(self.url) if self._should_process(u)]
+                probe_task = asyncio.create_task(
+                    self.smart_probe.probe_and_download(seed_urls, progress_callback=on_progress)
+                )
+                fusion_nodes, seed_pages_map = await asyncio.gather(fusion_task, probe_task)
                 
                 if fusion_nodes:
                     hierarchy_map = {}
@@ -186,23 +277,30 @@ class GitBookMultiDownloader:
                             'title': node['title']
                         }
                     
-                    self._emit_progress("stage", "analyzing")
                     self.logger.info(f"📋 Fusion Manager found {len(hierarchy_map)} unique pages across sources")
                     urls = [u for u in hierarchy_map.keys() if self._should_process(u)]
                     self.logger.info(f"🔍 Filtered to {len(urls)} pages")
                     
                     # --- SMART PROBE INTEGRATION ---
-                    # 1. Try to get native markdown first
+                    # 1. Try to get native markdown first (seed URLs were probed during discovery)
                     self._emit_progress("stage", "probing")
-                    native_pages_map = await self.smart_probe.probe_and_download(urls, progress_callback=on_progress)
+                    url_by_norm = {normalize_url(u): u for u in urls}
+                    probed_normalized = {normalize_url(u) for u in seed_urls}
+                    late_urls = [u for u in urls if normalize_url(u) not in probed_normalized]
+                    late_pages_map = {}
+                    if late_urls:
+                        late_pages_map = await self.smart_probe.probe_and_download(late_urls, progress_callback=on_progress)
+
+                    # Re-key probe hits onto the merged hierarchy's URLs
+                    native_pages_map = {}
+                    for u, content in list(seed_pages_map.items()) + list(late_pages_map.items()):
+                        merged_url = url_by_norm.get(normalize_url(u))
+                        if merged_url:
+                            native_pages_map[merged_url] = content
                     native_pages = []
                     
-                    # Deduplication Helper
-                    def normalize_u(u):
-                        return u.split('#')[0].split('?')[0].rstrip('/').replace('https://', '').replace('http://', '').replace('www.', '').lower()
-
-                    found_normalized = set(normalize_u(u) for u in native_pages_map.keys())
-                    remaining_urls = [u for u in urls if normalize_u(u) not in found_normalized]
+                    found_normalized = {normalize_url(u) for u in native_pages_map}
+                    remaining_urls = [u for u in urls if normalize_url(u) not in found_normalized]
                     
                     self.logger.info(f"⚡ Smart Probe found {len(native_pages_map)} native pages. {len(remaining_urls)} pages left for scraping.")
 
@@ -212,13 +310,9 @@ class GitBookMultiDownloader:
                         
                         # Fix "Untitled" by looking at content
                         if title in ['Untitled', 'Native Page', 'Introduction'] or not title:
-                            for line in content.splitlines()[:20]:
-                                if line.strip().startswith('# '):
-                                    title = line.strip()[2:].strip()
-                                    break
-                                elif line.strip().startswith('title: '): # Frontmatter
-                                    title = line.strip()[7:].strip().strip('"').strip("'")
-                                    break
+                            match = _TITLE_RE.search(content, 0, 2048)
+                            if match:
+                                title = match.group(1) or match.group(2)
                         
                         native_pages.append({
                             'title': title,
@@ -273,23 +367,8 @@ class GitBookMultiDownloader:
                 else:
                     strategy_order = [self.strategy]
 
-                for strategy_name in strategy_order:
-                    try:
-                        self._emit_progress("stage", "analyzing")
-                        self.logger.info(f"🔄 Trying {strategy_name} strategy...")
-                        strategy = self.strategies[strategy_name]
-                        pages = await strategy.extract_pages(self.url, self.section_path)
-
-                        if pages and len(pages) > 0:
-                            successful_strategy = strategy_name
-                            self.logger.info(f"✅ {strategy_name} strategy succeeded - found {len(pages)} pages")
-                            break
-                        else:
-                            self.logger.warning(f"⚠️  {strategy_name} strategy found no pages")
-
-                    except Exception as e:
-                        self.logger.warning(f"❌ {strategy_name} strategy failed: {e}")
-                        continue
+                self._emit_progress("stage", "analyzing")
+                successful_strategy, pages = await self._race_strategies(strategy_order)
 
             if not pages:
                 raise Exception("All download strategies failed - could not extract any pages")
@@ -297,18 +376,8 @@ class GitBookMultiDownloader:
             self.stats['strategy_used'] = successful_strategy
             self.stats['pages_downloaded'] = len(pages)
 
-            # Consolidate content
-            self._emit_progress("stage", "merging")
-            self.logger.info("📝 Consolidating content...")
-            
-            final_content = await self.consolidator.consolidate_pages(
-                pages, 
-                self.url, 
-                self.section_path,
-                hierarchy_map  # Pass hierarchy info
-            )
-
-            # Download assets if requested
+            # Download assets if requested (first, so links can be rewritten while writing)
+            rewrite = None
             if self.include_assets and self.asset_downloader:
                 self.logger.info("🖼️  Downloading assets...")
                 assets_downloaded = await self.asset_downloader.download_assets(
@@ -318,18 +387,34 @@ class GitBookMultiDownloader:
                 self.stats['assets_downloaded'] = assets_downloaded
 
                 # Update content with asset paths
-                final_content = self.asset_downloader.update_asset_references(
-                    final_content, 'assets'
-                )
+                rewrite = lambda text: self.asset_downloader.update_asset_references(text, 'assets')
 
-            # Write final file
-            self.logger.info("💾 Writing output file...")
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                f.write(final_content)
+            # Consolidate content straight into the output file
+            self._emit_progress("stage", "merging")
+            self.logger.info("📝 Consolidating content...")
+            
+            # Write to a temp file and swap it in only once complete, so a failure mid-stream
+            # never truncates an existing book or leaves a partial one in the library
+            part_file = self.output_file.with_name(self.output_file.name + '.part')
+            try:
+                with open(part_file, 'w', encoding='utf-8') as f:
+                    await self.consolidator.consolidate_pages(
+                        pages, 
+                        self.url, 
+                        self.section_path,
+                        hierarchy_map,  # Pass hierarchy info
+                        out_file=f,
+                        rewrite=rewrite
+                    )
+                os.replace(part_file, self.output_file)
+            except BaseException:
+                part_file.unlink(missing_ok=True)
+                raise
+            self.logger.info("💾 Output file written")
 
             # Cleanup temporary files if not keeping them
             if not self.keep_temp:
-                self._cleanup_temp_files()
+                await self._cleanup_temp_files()
 
             self.stats['end_time'] = time.time()
             duration = self.stats['end_time'] - self.stats['start_time']
@@ -346,18 +431,26 @@ class GitBookMultiDownloader:
 
         except Exception as e:
             self.logger.error(f"Download failed: {e}")
-            self._cleanup_temp_files()
+            await self._cleanup_temp_files()
             raise
+        finally:
+            for strategy_name in ('github', 'sitemap', 'scraping'):
+                await self.strategies[strategy_name].close()
 
-    def _cleanup_temp_files(self):
+    async def _cleanup_temp_files(self):
         """Clean up any temporary files/directories"""
         temp_dirs = ['temp_repo', 'temp_download', 'selenium_temp']
-
-        for temp_dir in temp_dirs:
-            temp_path = Path(temp_dir)
-            if temp_path.exists():
-                try:
-                    shutil.rmtree(temp_path)
-                    self.logger.debug(f"Cleaned up {temp_dir}")
-                except Exception as e:
-                    self.logger.warning(f"Could not clean up {temp_dir}: {e}")
+        temp_paths = [Path(d) for d in temp_dirs if Path(d).exists()]
+        if not temp_paths:
+            return
+
+        # rmtree is syscall-bound; run the directories in parallel off the event loop
+        results = await asyncio.gather(
+            *(asyncio.to_thread(shutil.rmtree, p) for p in temp_paths),
+            return_exceptions=True
+        )
+        for temp_path, result in zip(temp_paths, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Could not clean up {temp_path}: {result}")
+            else:
+                self.logger.debug(f"Cleaned up {temp_path}")
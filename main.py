@@ -44,6 +44,8 @@ Examples:
     parser.add_argument('--keep-temp', action='store_true', help='Keep temporary files')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
     parser.add_argument('--use-selenium', action='store_true', help='Force Selenium for JS rendering')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the on-disk probe cache')
+    parser.add_argument('--cache-ttl', type=int, default=86400, help='Probe cache lifetime in seconds')
 
     args = parser.parse_args()
 
@@ -68,7 +70,9 @@ Examples:
         include_assets=args.include_assets,
         keep_temp=args.keep_temp,
         use_selenium=args.use_selenium,
-        verbose=args.verbose
+        verbose=args.verbose,
+        use_cache=not args.no_cache,
+        cache_ttl=args.cache_ttl
     )
 
     try:
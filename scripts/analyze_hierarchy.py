@@ -1,5 +1,5 @@
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 import json
 import sys
 
@@ -7,15 +7,18 @@ def analyze(url):
     print(f"Fetching {url}...")
     try:
         headers = {'User-Agent': 'Mozilla/5.0'}
-        resp = requests.get(url, headers=headers)
+        resp = requests.get(url, headers=headers, stream=True)
+        resp.raw.decode_content = True
         
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        # Parse straight off the socket with lxml; no BS4 tree or full-body str copy
+        parser = etree.HTMLParser(collect_ids=False, recover=True)
+        tree = etree.parse(resp.raw, parser)
         
         # Check for Next.js data
-        next_data = soup.find('script', id='__NEXT_DATA__')
-        if next_data:
+        next_data = tree.find('.//script[@id="__NEXT_DATA__"]')
+        if next_data is not None:
             print("Found __NEXT_DATA__!")
-            data = json.loads(next_data.string)
+            data = json.loads(next_data.text)
             # Print keys to explore structure
             print("Keys:", data.keys())
             
@@ -33,7 +36,7 @@ def analyze(url):
             print("No __NEXT_DATA__ found.")
             
             # Check for other JSON blobs
-            scripts = soup.find_all('script', type='application/json')
+            scripts = tree.iterfind('.//script[@type="application/json"]')
             for s in scripts:
                 print(f"Found JSON script: {s.get('id')}")
 
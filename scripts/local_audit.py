@@ -2,39 +2,79 @@
 import subprocess
 import os
 import sys
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
-def run_command(command, description):
+# 记录上次成功安装时解释器路径与 requirements.txt 的哈希，均未变化则跳过 pip
+DEPS_STAMP = os.path.join('.gitbook_cache', 'deps.sha256')
+
+def run_command(command, description, label=None):
+    """逐行转发子进程输出（不在内存中缓存）；并行执行时用 label 区分各步骤的输出"""
     print(f"\n[🚀] {description}...")
+    prefix = f"[{label}] " if label else ""
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    except FileNotFoundError:
+        print(f"ℹ️ 未找到执行命令，跳过 {description}。")
+        return True
+
+    with proc.stdout:
+        for line in proc.stdout:
+            print(prefix + line, end='', flush=True)
+
+    if proc.wait() == 0:
         print(f"✅ {description}完成。")
-        if result.stdout:
-            print(result.stdout)
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {description}失败。")
-        if e.stdout:
-            print(e.stdout)
-        if e.stderr:
-            print(e.stderr)
-        return False
+    print(f"❌ {description}失败。")
+    return False
+
+def sync_dependencies(requirements='requirements.txt'):
+    """解释器与 requirements.txt 均未变化时直接跳过；否则优先使用 uv，回退到 pip"""
+    try:
+        with open(requirements, 'rb') as f:
+            # 换用其他解释器（新的虚拟环境）时即使依赖文件未变也需重新安装
+            digest = hashlib.sha256(sys.executable.encode('utf-8') + b'\0' + f.read()).hexdigest()
     except FileNotFoundError:
-        print(f"ℹ️ 未找到执行命令，跳过 {description}。")
+        print(f"ℹ️ 未找到 {requirements}，跳过依赖更新。")
         return True
 
+    try:
+        with open(DEPS_STAMP) as f:
+            if f.read().strip() == digest:
+                print("\n[✅] 依赖未变化，跳过更新 Python 依赖。")
+                return True
+    except FileNotFoundError:
+        pass
+
+    if shutil.which('uv'):
+        # 显式指定当前解释器：未激活虚拟环境时 uv 会报 "No virtual environment found"
+        ok = run_command(f'uv pip install --python "{sys.executable}" -r {requirements}', "更新 Python 依赖 (uv)")
+    else:
+        ok = run_command(f"pip install -r {requirements}", "更新 Python 依赖")
+
+    if ok:
+        os.makedirs(os.path.dirname(DEPS_STAMP), exist_ok=True)
+        with open(DEPS_STAMP, 'w') as f:
+            f.write(digest)
+    return ok
+
 def main():
     print("="*60)
     print("GitBook Downloader 本地安全与环境审核工具")
     print("="*60)
 
     # 1. 检查依赖
-    run_command("pip install -r requirements.txt", "更新 Python 依赖")
-
-    # 2. 代码规范检查
-    run_command("flake8 . --count --select=E9,F63,F7,F82 --show-source --statistics", "代码规范运行检查 (Flake8)")
+    sync_dependencies()
 
-    # 3. 单元测试
-    run_command("pytest", "运行单元测试 (Pytest)")
+    # 2. 代码规范检查 与 3. 单元测试 互不依赖，并行执行
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        checks = [
+            pool.submit(run_command, "flake8 . --count --select=E9,F63,F7,F82 --show-source --statistics", "代码规范运行检查 (Flake8)", "flake8"),
+            pool.submit(run_command, "pytest", "运行单元测试 (Pytest)", "pytest"),
+        ]
+        for check in checks:
+            check.result()
 
     print("\n✨ 审核流程结束。")
 
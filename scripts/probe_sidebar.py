@@ -1,12 +1,17 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import sys
 
+# Shared session: repeated probes reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': 'Mozilla/5.0'})
+SESSION.mount('https://', HTTPAdapter(pool_connections=20, pool_maxsize=20))
+
 def probe(url):
     print(f"Fetching {url}...")
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        resp = requests.get(url, headers=headers)
+        resp = SESSION.get(url, timeout=10)
         resp.raise_for_status()
         
         soup = BeautifulSoup(resp.text, 'html.parser')
@@ -25,7 +30,8 @@ def probe(url):
             if elem:
                 print(f"\n[!] Found sidebar with selector: {sel}")
                 # Print the first 2000 chars of structure to analyze nesting
-                print(elem.prettify()[:2000])
+                # (raw markup: prettify() would format the whole subtree first)
+                print(str(elem)[:2000])
                 found = True
         
         if not found:
@@ -37,4 +43,5 @@ def probe(url):
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    probe("https://docs.nado.xyz/faqs")
+    for url in sys.argv[1:] or ["https://docs.nado.xyz/faqs"]:
+        probe(url)
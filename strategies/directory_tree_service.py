@@ -1,230 +1,411 @@
 
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from utils.logger import get_logger
 from utils.doc_tree import DocNode
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 from urllib.parse import urljoin
-import time
+import asyncio
+import functools
+import itertools
+import copy
+import hashlib
+from pathlib import Path
+from utils.disk_cache import DiskCache
 from utils.driver_manager import DriverManager
 
+# Sidebar heuristic: the nav-like container with the most links (more than 3) wins.
+# The winner is tagged so later calls on the same page are a single selector lookup.
+PICK_SIDEBAR_JS = """
+function pickSidebar() {
+    const tagged = document.querySelector('[data-auditor-sidebar]');
+    if (tagged) return tagged;
+    const cands = document.querySelectorAll("nav, aside, div[class*='sidebar'], [data-testid='sidebar']");
+    let best = null, max = 0;
+    cands.forEach(c => {
+        const n = c.querySelectorAll('a').length;
+        if (n > max && n > 3) { max = n; best = c; }
+    });
+    if (best) best.setAttribute('data-auditor-sidebar', '1');
+    return best;
+}
+"""
+
+FIND_SIDEBAR_JS = PICK_SIDEBAR_JS + """
+const sidebar = pickSidebar();
+return sidebar ? sidebar.outerHTML : null;
+"""
+
+# Flat-parser adjacency computed in the page (same rules as _parse_flat_structure):
+# the first toclink in an LI heads it; later toclinks hang off the nearest LI header.
+# Returns null when the sidebar is not toclink-based so the HTML parser takes over.
+EXTRACT_TOC_JS = PICK_SIDEBAR_JS + """
+const best = pickSidebar();
+if (!best) return null;
+const links = Array.from(best.querySelectorAll("a[class*='toclink']"));
+if (links.length <= 3) return null;
+
+const textOf = el => {
+    const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+    let text = '', node;
+    while ((node = walker.nextNode())) text += node.nodeValue.trim();
+    return text;
+};
+const ancestorLis = el => {
+    const lis = [];
+    for (let e = el.parentElement; e && e !== best; e = e.parentElement) {
+        if (e.tagName === 'LI') lis.push(e);
+    }
+    return lis;
+};
+const owner = new Map();
+return links.map((link, i) => {
+    const lis = ancestorLis(link);
+    let parent = -1;
+    if (lis.length) {
+        if (owner.has(lis[0])) {
+            parent = owner.get(lis[0]);
+        } else {
+            owner.set(lis[0], i);
+            const anc = lis.slice(1).find(li => owner.has(li));
+            if (anc) parent = owner.get(anc);
+        }
+    }
+    return {title: textOf(link), href: link.getAttribute('href'), parent: parent, depth: lis.length};
+});
+"""
+
+BREADCRUMB_SELECTOR = "nav[aria-label='Breadcrumb'] li, .gitbook-breadcrumbs a"
+
+# Breadcrumb texts and page title in one round trip instead of one per element
+SCRAPE_BREADCRUMBS_JS = """
+const crumbs = Array.from(document.querySelectorAll(arguments[0]), e => e.innerText.trim())
+    .filter(t => t && t !== '/');
+return {crumbs: crumbs, title: document.title};
+"""
+
+# Precompiled sidebar queries (libxml2 evaluates these without Python tree walks)
+TOCLINK_XPATH = etree.XPath(".//a[contains(@class, 'toclink')]")
+TOCLINK_AT_DEPTH_XPATH = etree.XPath(".//a[contains(@class, 'toclink')][count(ancestor::li) = $depth]")
+DIRECT_LI_XPATH = etree.XPath("./li")
+HAS_LINK_XPATH = etree.XPath("boolean(.//a)")
+TOC_CONTAINER_XPATH = etree.XPath(".//div[@data-testid='toc-scroll-container']")
+
+# === PHASE 1: CSS Force-Reveal ===
+FORCE_REVEAL_JS = """
+function forceExpandTree() {
+    const selectors = [
+        'div[data-state="closed"]',  // Radix UI / GitBook
+        'div[style*="height: 0"]',   // Inline style collapse
+        'ul.hidden',                 // Tailwind hidden
+        'nav div.overflow-hidden',    // Common wrapper
+        '[aria-hidden="true"]'       // Aria hidden
+    ];
+
+    const allCollapsed = document.querySelectorAll(selectors.join(','));
+    let count = 0;
+    allCollapsed.forEach(el => {
+        el.style.display = 'block';
+        el.style.height = 'auto';
+        el.style.maxHeight = 'none';
+        el.style.visibility = 'visible';
+        el.style.opacity = '1';
+        el.style.overflow = 'visible';
+        el.setAttribute('data-force-expanded', 'true');
+        el.setAttribute('data-state', 'open');
+        el.setAttribute('aria-expanded', 'true');
+        el.setAttribute('aria-hidden', 'false');
+        count++;
+    });
+    return count;
+}
+"""
+
+# === PHASE 2: Click-Based Expansion for Nado ===
+# Nado uses <a class="toclink"> with sibling <div> for expandable sections
+CLICK_EXPAND_JS = """
+function clickExpandAll() {
+    let clickCount = 0;
+    
+    // Strategy 1: Click toclink elements that have sibling divs (Nado-specific)
+    const toclinks = document.querySelectorAll('a.toclink');
+    toclinks.forEach(link => {
+        const nextSib = link.nextElementSibling;
+        if (nextSib && nextSib.tagName === 'DIV') {
+            // Check if the sibling div is hidden/collapsed
+            const style = window.getComputedStyle(nextSib);
+            if (style.display === 'none' || style.height === '0px' || style.visibility === 'hidden') {
+                try {
+                    link.click();
+                    clickCount++;
+                } catch(e) {}
+            }
+        }
+    });
+    
+    // Strategy 2: Generic aria-expanded toggle
+    const toggles = document.querySelectorAll('[aria-expanded="false"], [data-state="closed"]');
+    toggles.forEach(el => {
+        try {
+            el.click();
+            clickCount++;
+        } catch(e) {}
+    });
+    
+    // Strategy 3: SVG chevron icons as fallback
+    const chevrons = document.querySelectorAll('svg[class*="icon"]');
+    chevrons.forEach(svg => {
+        let clickTarget = svg.closest('span') || svg.closest('button') || svg.parentElement;
+        if (clickTarget && clickTarget.click) {
+            try {
+                clickTarget.click();
+                clickCount++;
+            } catch(e) {}
+        }
+    });
+    
+    return clickCount;
+}
+"""
+
+# CSS pass, up to 3 click passes for deep nesting, final CSS pass - with the
+# animation waits done in the browser instead of one WebDriver call per phase
+EXPAND_LIBRARY_JS = FORCE_REVEAL_JS + CLICK_EXPAND_JS + PICK_SIDEBAR_JS + """
+window.__gbExpandSidebar = async function () {
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    const stats = {revealed: forceExpandTree(), passes: [], final: 0};
+    await sleep(500);
+    for (let i = 0; i < 3; i++) {
+        const clicked = clickExpandAll();
+        if (!clicked) break;  // No more elements to expand
+        stats.passes.push(clicked);
+        await sleep(500);
+    }
+    // Final CSS pass to catch any newly revealed elements
+    stats.final = forceExpandTree();
+    // Pick (and tag) the sidebar from the fully expanded DOM
+    const sidebar = pickSidebar();
+    stats.sidebar = sidebar ? sidebar.outerHTML : null;
+    return stats;
+};
+"""
+
+# Tiny per-page call once the library is preinstalled via CDP; null means "not installed"
+RUN_EXPAND_JS = """
+const done = arguments[arguments.length - 1];
+if (typeof window.__gbExpandSidebar !== 'function') { done(null); return; }
+window.__gbExpandSidebar().then(done, e => done({error: String(e)}));
+"""
+
+# Fallback for drivers without CDP: ship the library with every call
+EXPAND_SIDEBAR_JS = EXPAND_LIBRARY_JS + RUN_EXPAND_JS
+
+def _first(nodes):
+    return nodes[0] if nodes else None
+
+def _li_parts(li):
+    """Single pass over an LI's children: (first a, else first div's first a; direct divs)"""
+    direct_a = None
+    divs = []
+    for child in li.iterchildren('a', 'div'):
+        if child.tag == 'a':
+            if direct_a is None:
+                direct_a = child
+        else:
+            divs.append(child)
+    if direct_a is None and divs:
+        direct_a = next(divs[0].iterchildren('a'), None)
+    return direct_a, divs
+
+@functools.lru_cache(maxsize=4096)
+def _join_href(base_url, href):
+    """Absolute page URL for a sidebar href; sidebars repeat hrefs (anchors, duplicates)"""
+    return urljoin(base_url, href).split('#', 1)[0]
+
+def _page_key(url):
+    """Comparison key for sidebar vs sitemap URLs: no fragment, no trailing slash"""
+    return url.split('#', 1)[0].rstrip('/')
+
+def _text(el):
+    """Equivalent of BeautifulSoup get_text(strip=True)"""
+    return ''.join(t.strip() for t in el.itertext())
+
 class DirectoryTreeService:
     """
     Dedicated service for building, verifying, and healing the Document Tree.
     Isolates volatile DOM interaction logic from the main application.
     """
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, cache_dir=None):
         self.verbose = verbose
         self.logger = get_logger()
+        # base_url -> (sidebar hash, parsed tree); optionally mirrored to cache_dir
+        self._tree_cache = {}
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._disk_cache = DiskCache(self.cache_dir, verbose=verbose) if self.cache_dir else None
+        # Driver sessions that evaluate EXPAND_LIBRARY_JS on every new document
+        self._preloaded_sessions = set()
+        # Browsers used to scrape breadcrumbs of missing pages concurrently
+        self.heal_workers = 4
+        # Upper bound for DOM readiness waits (returns as soon as the selector matches)
+        self.wait_timeout = 10
+        # Many pages have no breadcrumbs at all; don't spend more than the old fixed 1.5s on them
+        self.breadcrumb_timeout = 1.5
 
     async def build(self, base_url):
         """
         Builds the semantic DocNode tree.
         Orchestrates Expansion -> Parsing -> Validation -> Healing.
         """
-        driver = DriverManager().get_driver()
+        driver = DriverManager().get_driver(lightweight=True)
         
         # 1. Navigation & Force-Expansion
         self.logger.info(f"🌳 [TreeService] constructing tree for {base_url}")
+        self._preload_expand_library(driver)
         driver.get(base_url)
-        time.sleep(2) # Hydration wait
+        self._wait_for(driver, "nav a, aside a, div[class*='sidebar'] a") # Hydration wait
         
-        sidebar = self._get_sidebar(driver)
+        # Force Expand (CSS + clicks); returns the freshly located sidebar HTML
+        sidebar = self._expand_sidebar(driver)
         if not sidebar:
             self.logger.error("  ❌ [TreeService] Sidebar not found!")
             return DocNode("Root")
-            
-        # Force Expand (CSS)
-        sidebar = self._expand_sidebar(driver)
         
-        # 2. Parse Tree (Visual)
-        tree_root = self._parse_to_tree(sidebar, base_url)
+        # 2. Parse Tree (Visual), skipped when the expanded sidebar is unchanged
+        digest = hashlib.blake2b(sidebar.encode('utf-8'), digest_size=16).hexdigest()
+        cached = self._load_cached_tree(base_url, digest)
+        if cached is not None:
+            self.logger.info("  ♻️ [TreeService] Sidebar unchanged, reusing parsed tree.")
+            return cached
+        
+        # Flat (toclink) sidebars are walked in the browser; nested lists need the HTML parser
+        items = self._extract_toc_items(driver)
+        if items:
+            tree_root = self._tree_from_toc_items(items, base_url)
+        else:
+            tree_root = self._parse_to_tree(sidebar, base_url)
+        self._store_cached_tree(base_url, digest, tree_root)
         
         return tree_root
 
+    def _load_cached_tree(self, base_url, digest):
+        """Deep copy of the tree parsed from identical sidebar HTML, if any"""
+        entry = self._tree_cache.get(base_url)
+        if entry and entry[0] == digest:
+            return copy.deepcopy(entry[1])
+        if self._disk_cache:
+            # One JSON entry per site, replaced whenever its sidebar changes
+            entry = self._disk_cache.get(f"tree:{base_url}")
+            if entry and entry.get('digest') == digest:
+                try:
+                    tree_root = DocNode.from_dict(entry['tree'])
+                except (KeyError, TypeError) as e:
+                    self.logger.debug(f"Ignoring unreadable tree cache for {base_url}: {e}")
+                else:
+                    self._tree_cache[base_url] = (digest, tree_root)
+                    return copy.deepcopy(tree_root)
+        return None
+
+    def _store_cached_tree(self, base_url, digest, tree_root):
+        # Healing mutates the returned tree, so the cache keeps its own copy
+        tree_root = copy.deepcopy(tree_root)
+        self._tree_cache[base_url] = (digest, tree_root)
+        if self._disk_cache:
+            self._disk_cache.set(f"tree:{base_url}", {'digest': digest, 'tree': tree_root.to_dict()})
+
+    def _wait_for(self, driver, selector, timeout=None):
+        """Block until `selector` matches, or give up quietly after `timeout` (default wait_timeout)"""
+        try:
+            WebDriverWait(driver, timeout or self.wait_timeout).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector)))
+            return True
+        except TimeoutException:
+            self.logger.debug(f"Timed out waiting for {selector}")
+            return False
+
     def _get_sidebar(self, driver):
-        """Find the main sidebar element using heuristics"""
+        """outerHTML of the main sidebar, picked by link count in a single round trip"""
         try:
-            candidates = driver.find_elements(By.CSS_SELECTOR, "nav, aside, div[class*='sidebar'], [data-testid='sidebar']")
-            sidebar = None
-            max_links = 0
-            
-            for i, cand in enumerate(candidates):
-                try:
-                    links = cand.find_elements(By.TAG_NAME, 'a')
-                    count = len(links)
-                    if count > max_links and count > 3:
-                        max_links = count
-                        sidebar = cand
-                except:
-                    continue
-            return sidebar
+            return driver.execute_script(FIND_SIDEBAR_JS)
         except Exception as e:
             self.logger.debug(f"Error finding sidebar: {e}")
             return None
 
+    def _preload_expand_library(self, driver):
+        """Register the expansion scripts once per driver so V8 compiles them once per page load, not per call"""
+        if driver.session_id in self._preloaded_sessions:
+            return
+        try:
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': EXPAND_LIBRARY_JS})
+            self._preloaded_sessions.add(driver.session_id)
+        except Exception as e:
+            self.logger.debug(f"CDP preload unavailable, shipping expansion script per call: {e}")
+
     def _expand_sidebar(self, driver):
         """
         Multi-Phase Force-Reveal:
         1. CSS injection for standard GitBook
         2. Click-based expansion for Nado-style chevron toggles
+        All phases (and the animation waits between them) run in one async script round trip.
         """
         self.logger.info("  🔓 [TreeService] Executing Multi-Phase Force-Reveal...")
         
-        # === PHASE 1: CSS Force-Reveal ===
-        force_reveal_script = """
-        (function forceExpandTree() {
-            const selectors = [
-                'div[data-state="closed"]',  // Radix UI / GitBook
-                'div[style*="height: 0"]',   // Inline style collapse
-                'ul.hidden',                 // Tailwind hidden
-                'nav div.overflow-hidden',    // Common wrapper
-                '[aria-hidden="true"]'       // Aria hidden
-            ];
-
-            const allCollapsed = document.querySelectorAll(selectors.join(','));
-            let count = 0;
-            allCollapsed.forEach(el => {
-                el.style.display = 'block';
-                el.style.height = 'auto';
-                el.style.maxHeight = 'none';
-                el.style.visibility = 'visible';
-                el.style.opacity = '1';
-                el.style.overflow = 'visible';
-                el.setAttribute('data-force-expanded', 'true');
-                el.setAttribute('data-state', 'open');
-                el.setAttribute('aria-expanded', 'true');
-                el.setAttribute('aria-hidden', 'false');
-                count++;
-            });
-            return count;
-        })();
-        """
         try:
-            count = driver.execute_script(force_reveal_script)
-            self.logger.info(f"  ⚡ Phase 1 (CSS): Force-revealed {count} elements.")
-            time.sleep(0.5)
+            stats = None
+            if driver.session_id in self._preloaded_sessions:
+                stats = driver.execute_async_script(RUN_EXPAND_JS)
+            if stats is None:
+                stats = driver.execute_async_script(EXPAND_SIDEBAR_JS) or {}
+            if stats.get('error'):
+                self.logger.warning(f"  Force-Reveal error: {stats['error']}")
+            self.logger.info(f"  ⚡ Phase 1 (CSS): Force-revealed {stats.get('revealed', 0)} elements.")
+            for pass_num, click_count in enumerate(stats.get('passes', [])):
+                self.logger.info(f"  🖱️ Phase 2 Pass {pass_num + 1}: Clicked {click_count} expansion toggles.")
+            if stats.get('final'):
+                self.logger.info(f"  ⚡ Phase 3 (Final CSS): Revealed {stats['final']} additional elements.")
+            # The runner already picked the sidebar from the expanded DOM
+            if stats.get('sidebar'):
+                return stats['sidebar']
         except Exception as e:
-            self.logger.warning(f"  Phase 1 error: {e}")
+            self.logger.warning(f"  Force-Reveal error: {e}")
 
-        # === PHASE 2: Click-Based Expansion for Nado ===
-        # Nado uses <a class="toclink"> with sibling <div> for expandable sections
-        click_expand_script = """
-        (function clickExpandAll() {
-            let clickCount = 0;
-            
-            // Strategy 1: Click toclink elements that have sibling divs (Nado-specific)
-            const toclinks = document.querySelectorAll('a.toclink');
-            toclinks.forEach(link => {
-                const nextSib = link.nextElementSibling;
-                if (nextSib && nextSib.tagName === 'DIV') {
-                    // Check if the sibling div is hidden/collapsed
-                    const style = window.getComputedStyle(nextSib);
-                    if (style.display === 'none' || style.height === '0px' || style.visibility === 'hidden') {
-                        try {
-                            link.click();
-                            clickCount++;
-                        } catch(e) {}
-                    }
-                }
-            });
-            
-            // Strategy 2: Generic aria-expanded toggle
-            const toggles = document.querySelectorAll('[aria-expanded="false"], [data-state="closed"]');
-            toggles.forEach(el => {
-                try {
-                    el.click();
-                    clickCount++;
-                } catch(e) {}
-            });
-            
-            // Strategy 3: SVG chevron icons as fallback
-            const chevrons = document.querySelectorAll('svg[class*="icon"]');
-            chevrons.forEach(svg => {
-                let clickTarget = svg.closest('span') || svg.closest('button') || svg.parentElement;
-                if (clickTarget && clickTarget.click) {
-                    try {
-                        clickTarget.click();
-                        clickCount++;
-                    } catch(e) {}
-                }
-            });
-            
-            return clickCount;
-        })();
-        """
-        
-        # Run multiple expansion passes to handle deep nesting
-        for pass_num in range(3):
-            try:
-                click_count = driver.execute_script(click_expand_script)
-                if click_count > 0:
-                    self.logger.info(f"  🖱️ Phase 2 Pass {pass_num + 1}: Clicked {click_count} expansion toggles.")
-                    time.sleep(0.5)
-                else:
-                    break  # No more elements to expand
-            except Exception as e:
-                self.logger.debug(f"  Phase 2 Pass {pass_num + 1} error: {e}")
-                break
-        
-        # Final CSS pass to catch any newly revealed elements
-        try:
-            final_count = driver.execute_script(force_reveal_script)
-            if final_count > 0:
-                self.logger.info(f"  ⚡ Phase 3 (Final CSS): Revealed {final_count} additional elements.")
-        except:
-            pass
-        
-        time.sleep(1.0)
-
-        # Return fresh sidebar from DOM
+        # Return fresh sidebar HTML from DOM
         return self._get_sidebar(driver)
 
-    def _parse_to_tree(self, root_element, base_url):
-        """Parses the sidebar DOM into DocNode tree - Dual Mode Support"""
-        html = root_element.get_attribute('outerHTML')
-        soup = BeautifulSoup(html, 'html.parser')
+    def _parse_to_tree(self, html, base_url):
+        """Parses the sidebar outerHTML into DocNode tree - Dual Mode Support"""
+        root = lxml_html.fromstring(html)
         
         
         doc_root = DocNode("Documentation Root", level=0)
         print("!!! I AM RUNNING _parse_to_tree !!!", flush=True)
         # === STRUCTURE DETECTION ===
-        # Robust Nado Detection with Fallback
-        toclinks = soup.select('a[class*="toclink"]')
+        # Nado detection: contains(@class, 'toclink') also covers 'group/toclink'
+        toclinks = TOCLINK_XPATH(root)
         
-        if not toclinks or len(toclinks) <= 3:
-            # Fallback: Manual class inspection
-            all_a = soup.find_all('a')
-            manual_toclinks = []
-            for a in all_a:
-                classes = a.get('class', [])
-                # Handle list of strings or single string
-                if isinstance(classes, list):
-                    if any('toclink' in c for c in classes) or any('group/toclink' in c for c in classes):
-                        manual_toclinks.append(a)
-                elif isinstance(classes, str):
-                    if 'toclink' in classes:
-                        manual_toclinks.append(a)
-            
-            if len(manual_toclinks) > 3:
-                self.logger.info(f"  🔍 Detected Nado-style flat structure (Manual Fallback: {len(manual_toclinks)} links). Using Flat Parser.")
-                toclinks = manual_toclinks # Use these for consistency if needed, though _parse_flat_structure re-selects
-                return self._parse_flat_structure(soup, base_url, doc_root)
-
         if toclinks and len(toclinks) > 3:
             self.logger.info("  🔍 Detected Nado-style flat structure (toclink). Using Flat Parser.")
-            return self._parse_flat_structure(soup, base_url, doc_root)
+            return self._parse_flat_structure(root, base_url, doc_root)
         
         # Standard: Nested li > ul structure
         self.logger.info("  🔍 Detected standard nested structure. Using Nested Parser.")
-        root_ul = soup.find('ul')
-        if not root_ul:
-            container = soup.find('div', {'data-testid': 'toc-scroll-container'})
-            if container: root_ul = container.find('ul')
+        root_ul = next(root.iter('ul'), None)
+        if root_ul is None:
+            container = next(iter(TOC_CONTAINER_XPATH(root)), None)
+            if container is not None: root_ul = next(container.iter('ul'), None)
             
-        if not root_ul: return doc_root
+        if root_ul is None: return doc_root
         
-        def parse_recursive(ul_node, parent_node, current_level):
-            list_items = ul_node.find_all('li', recursive=False)
+        # Explicit stack of (ul, parent, level) instead of recursion: deep GitBooks
+        # cannot hit the recursion limit. Each node's children still come from a
+        # single UL in document order, so the tree is identical.
+        stack = [(root_ul, doc_root, 1)]
+        while stack:
+            ul_node, parent_node, current_level = stack.pop()
+            nested_lists = []
+            list_items = DIRECT_LI_XPATH(ul_node)
             
             # Context for flat lists: If we find a Type B header, it captures subsequent Type A siblings
             current_section_node = None
@@ -234,23 +415,20 @@ class DirectoryTreeService:
                 url = None
                 
                 # Check Direct Link (Type A)
-                direct_a = li.find('a', recursive=False)
-                if not direct_a:
-                     wrapper = li.find('div', recursive=False)
-                     if wrapper: direct_a = wrapper.find('a', recursive=False)
+                direct_a, divs = _li_parts(li)
                 
                 node_type = 'B'
-                if direct_a:
+                if direct_a is not None:
                     node_type = 'A'
-                    title = direct_a.get_text(strip=True)
+                    title = _text(direct_a)
                     href = direct_a.get('href')
                     if href:
-                        url = urljoin(base_url, href).split('#')[0]
+                        url = _join_href(base_url, href)
                 else:
                     # Group Header (Type B)
-                    for child in li.find_all('div', recursive=False):
-                        if not child.find('a'):
-                            title = child.get_text(strip=True)
+                    for child in divs:
+                        if not HAS_LINK_XPATH(child):
+                            title = _text(child)
                             break
                 
                 # Determine Parent
@@ -265,25 +443,27 @@ class DirectoryTreeService:
                 target_parent.add_child(new_node)
                 
                 # Handling Nesting
-                nested_ul = li.find('ul')
+                nested_ul = next(li.iterdescendants('ul'), None)
                 
                 if node_type == 'B':
-                    if nested_ul:
+                    if nested_ul is not None:
                          # Standard GitBook: Header contains UL. Reset section context because nesting is strict.
                          current_section_node = None 
                     else:
                          # Flat GitBook: Header has NO UL. It acts as a folder for subsequent siblings.
                          current_section_node = new_node
                 
-                # Recurse
-                if nested_ul:
-                    # If recursing, children inside UL belong to new_node (Standard)
-                    parse_recursive(nested_ul, new_node, current_level + 1)
+                # Descend
+                if nested_ul is not None:
+                    # Children inside UL belong to new_node (Standard)
+                    nested_lists.append((nested_ul, new_node, current_level + 1))
+            
+            # Reversed so the next pop continues in document order
+            stack.extend(reversed(nested_lists))
                     
-        parse_recursive(root_ul, doc_root, current_level=1)
         return doc_root
 
-    def _parse_flat_structure(self, soup, base_url, doc_root):
+    def _parse_flat_structure(self, root, base_url, doc_root):
         """
         Parses Nado-style sidebar using nested List traversal.
         Instead of depth calc (brittle), we follow LI -> UL -> LI structure.
@@ -293,37 +473,56 @@ class DirectoryTreeService:
         # Simpler: Roots are toclinks in the "Main" UL?
         # Or: Use the depths just to find Roots (min_depth), but structure for Children.
         
-        all_links = soup.select('a[class*="toclink"]')
-        if not all_links:
-             # Try fallback again just in case
-             all_a = soup.find_all('a')
-             for a in all_a:
-                classes = a.get('class', [])
-                if isinstance(classes, list):
-                    if any('toclink' in c for c in classes): all_links.append(a)
-                elif isinstance(classes, str) and 'toclink' in classes: all_links.append(a)
-
+        all_links = TOCLINK_XPATH(root)
         if not all_links:
             self.logger.warning("  ⚠️ Flat Parser found no links.")
             return doc_root
 
-        processed_urls = set()
-        
         def get_url(link):
             href = link.get('href')
             if href:
-               return urljoin(base_url, href).split('#')[0]
+               return _join_href(base_url, href)
             return None
 
-        # Helper to find depth for Root detection only
-        link_depths = {l: len(l.find_parents('li')) for l in all_links}
-        min_depth = min(link_depths.values()) if link_depths else 0
+        # Depth is only needed for Root detection: probe depths from 0 upward and stop at
+        # the first level that has toclinks, instead of counting ancestors for every link
+        for min_depth in itertools.count():
+            shallowest = TOCLINK_AT_DEPTH_XPATH(root, depth=min_depth)
+            if shallowest: break
+        root_candidates = set(shallowest)
         
         self.logger.info(f"  🔍 Flat Parser: Found {len(all_links)} links. Root depth: {min_depth}")
 
+        # Build parent/child adjacency in one linear pass instead of re-searching each LI.
+        # The first toclink inside an LI is that item's header; any other toclink hangs off
+        # the header of its nearest LI that already has one (LI -> DIV/UL -> LI nesting).
+        owner_of_li = {}
+        children_of = {}
+        roots = []
+        for link in all_links:
+            li = next(link.iterancestors('li'), None)
+            parent = None
+            if li is not None:
+                if li in owner_of_li:
+                    parent = owner_of_li[li]
+                else:
+                    owner_of_li[li] = link
+                    parent = next((owner_of_li[anc] for anc in li.iterancestors('li') if anc in owner_of_li), None)
+
+            if parent is not None:
+                children_of.setdefault(parent, []).append(link)
+            elif link in root_candidates:
+                roots.append(link)
+
+        return self._emit_flat_tree(roots, children_of, _text, get_url, doc_root)
+
+    def _emit_flat_tree(self, roots, children_of, title_of, url_of, doc_root):
+        """Turn flat-parser adjacency (root links + header -> child links) into DocNodes"""
+        processed_urls = set()
+
         def process_node_from_link(link, parent_node, current_level):
-            title = link.get_text(strip=True)
-            url = get_url(link)
+            title = title_of(link)
+            url = url_of(link)
             
             # De-dupe
             if url and url in processed_urls: return
@@ -332,85 +531,43 @@ class DirectoryTreeService:
             new_node = DocNode(title, level=current_level, url=url)
             parent_node.add_child(new_node)
             
-            # Find Children via DOM
-            # Scope: The LI containing this link
-            li = link.find_parent('li')
-            if li:
-                # Look for a nested container inside this LI
-                # Nado uses DIV. GitBook uses UL. We check ALL children containers.
-                # We specifically look for containers that hold `toclink`s.
-                
-                # Strategy: Find any descendant container that holds links
-                # Caution: Use recursive=False or specific search to avoid finding siblings' children?
-                # No, we are in 'li'. Everything in 'li' (except the header link) belongs to this item.
-                
-                # Robust: Find ALL descendant 'a' tags with toclink class in this LI.
-                # Filter out the current 'link' itself.
-                # Filter out 'grandchildren'? 
-                # Grandchildren are inside nested LIs.
-                # If we iterate ALL descendants, we flatten the hierarchy relative to 'link'.
-                # But 'process_node_from_link' adds them as DIRECT children.
-                # So we MUST find the IMMEDIATE child container.
-                
-                # Check direct children of LI (skip the 'a' header)
-                # Usually: LI -> [A, DIV/UL]
-                # So verify direct children.
-                direct_children = li.find_all(recursive=False)
-                for child in direct_children:
-                    if child.name == 'a': continue # Skip the header itself
-                    
-                    # If this child is a container (div/ul), process its links
-                    # But we need its "items".
-                    # If it's a UL, items are LIs.
-                    # If it's a DIV (Nado Flat), items are A tags + DIV pairs? Or DIV -> UL?
-                    # `analyze_sidebar` said "Div -> Found X toclinks inside".
-                    # It implies the DIV directly contains the A tags? Or DIV -> UL -> LI?
-                    # Let's search for 'a.toclink' inside this container, BUT exclude any that are deeper?
-                    
-                    # Safe Strategy: 
-                    # If we find a UL, iterate LIs.
-                    # If we find a DIV, check if it contains UL.
-                    container_ul = child.find('ul') if child.name == 'div' else (child if child.name == 'ul' else None)
-                    
-                    if container_ul:
-                        # Standard list iter
-                        c_lis = container_ul.find_all('li', recursive=False)
-                        for c_li in c_lis:
-                            candidates = c_li.find_all('a')
-                            for c in candidates:
-                                if any('toclink' in x for x in c.get('class', [])):
-                                    process_node_from_link(c, new_node, current_level + 1)
-                                    break # One link per LI
-                    else:
-                        # Maybe direct links inside DIV (weird flat structure)?
-                        # Or DIV -> DIV -> ...
-                        # Let's try finding all 'toclink's inside this container that are NOT nested in another UL/LI
-                        # Actually, if we just recurse on `toclinks` found here, relying on `process` to establish hierarchy...
-                        # If we treat them as direct children, it might be OK properly.
-                        
-                        # Let's try explicit:
-                        sub_links = child.select('a[class*="toclink"]')
-                        # Only process if they don't have a parent LI that is inside 'child'?
-                        # i.e. are they "top level" relative to 'child'?
-                        for sl in sub_links:
-                             # Check if sl's parent LI is 'li' (our current LI) or 'child' itself logic?
-                             # This is getting complex.
-                             
-                             # Simple Fallback: Just process them.
-                             # If they are duplicates (grandchildren), 'processed_urls' prevents re-adding.
-                             # BUT we want correct parent.
-                             process_node_from_link(sl, new_node, current_level + 1)
-
-            return
+            for child in children_of.get(link, ()):
+                process_node_from_link(child, new_node, current_level + 1)
 
         # Process Roots (items at min_depth)
-        for link in all_links:
-            if link_depths[link] == min_depth:
-                process_node_from_link(link, doc_root, level=1)
+        for link in roots:
+            process_node_from_link(link, doc_root, current_level=1)
         
         self.logger.info(f"  📊 Flat Parser extracted {len(doc_root.children)} top-level nodes.")
         return doc_root
 
+    def _extract_toc_items(self, driver):
+        """Flat (toclink) sidebar as [{title, href, parent, depth}] built in the browser, or None"""
+        try:
+            return driver.execute_script(EXTRACT_TOC_JS)
+        except Exception as e:
+            self.logger.debug(f"In-browser TOC extraction failed: {e}")
+            return None
+
+    def _tree_from_toc_items(self, items, base_url):
+        """Same tree as _parse_flat_structure, from the browser-side adjacency list"""
+        self.logger.info(f"  🔍 Detected Nado-style flat structure (toclink). Extracted {len(items)} links in browser.")
+        min_depth = min(item['depth'] for item in items)
+        children_of = {}
+        roots = []
+        for idx, item in enumerate(items):
+            if item['parent'] >= 0:
+                children_of.setdefault(item['parent'], []).append(idx)
+            elif item['depth'] == min_depth:
+                roots.append(idx)
+
+        def url_of(idx):
+            href = items[idx]['href']
+            return _join_href(base_url, href) if href else None
+
+        doc_root = DocNode("Documentation Root", level=0)
+        return self._emit_flat_tree(roots, children_of, lambda idx: items[idx]['title'], url_of, doc_root)
+
     async def verify_and_heal(self, tree_root, sitemap_urls):
         """
         Cross-Verification Logic:
@@ -419,15 +576,16 @@ class DirectoryTreeService:
         if not sitemap_urls: return tree_root
         
         tree_urls = set()
-        def collect_urls(node):
+        stack = [tree_root]
+        while stack:
+            node = stack.pop()
             if node.url:
-                u = node.url.split('#')[0].rstrip('/')
-                tree_urls.add(u)
-            for child in node.children:
-                collect_urls(child)
-        collect_urls(tree_root)
+                tree_urls.add(_page_key(node.url))
+            stack.extend(node.children)
         
-        missing = [u for u in sitemap_urls if u.split('#')[0].rstrip('/') not in tree_urls]
+        # One key per sitemap URL; the dict also drops duplicate entries while keeping sitemap order
+        sitemap_by_key = {_page_key(u): u for u in sitemap_urls}
+        missing = [u for k, u in sitemap_by_key.items() if k not in tree_urls]
         
         if not missing:
             self.logger.info("  ✅ [TreeService] Verification Passed.")
@@ -435,30 +593,43 @@ class DirectoryTreeService:
             
         self.logger.warning(f"  ⚠️ [TreeService] Found {len(missing)} missing pages. Healing...")
         
-        driver = DriverManager().get_driver()
-        for url in missing:
+        pool = DriverManager().get_driver_pool(min(self.heal_workers, len(missing)), lightweight=True)
+        
+        async def scrape(url):
+            driver = await pool.acquire()
             try:
-                tree_root = await self._heal_with_breadcrumbs(driver, tree_root, url)
-            except Exception as e:
-                self.logger.warning(f"  ❌ Failed to heal {url}: {e}")
+                return await asyncio.to_thread(self._scrape_breadcrumbs, driver, url)
+            finally:
+                pool.release(driver)
+        
+        results = await asyncio.gather(*(scrape(u) for u in missing), return_exceptions=True)
+        
+        # Tree mutations stay on the event loop, applied in sitemap order
+        for url, result in zip(missing, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"  ❌ Failed to heal {url}: {result}")
+                continue
+            crumbs, page_title = result
+            tree_root = self._heal_with_breadcrumbs(tree_root, url, crumbs, page_title)
                 
         return tree_root
         
-    async def _heal_with_breadcrumbs(self, driver, root, url):
+    def _scrape_breadcrumbs(self, driver, url):
+        """Blocking page visit; runs in a worker thread with its own driver"""
         driver.get(url)
-        time.sleep(1.5)
         
-        crumbs = []
+        if not self._wait_for(driver, BREADCRUMB_SELECTOR, self.breadcrumb_timeout):
+            return [], driver.title
+
         try:
-            container = driver.find_elements(By.CSS_SELECTOR, "nav[aria-label='Breadcrumb'] li, .gitbook-breadcrumbs a")
-            if container:
-                for el in container:
-                    t = el.text.strip()
-                    if t and t != '/': crumbs.append(t)
-        except: pass
+            page = driver.execute_script(SCRAPE_BREADCRUMBS_JS, BREADCRUMB_SELECTOR)
+            return page['crumbs'], page['title']
+        except Exception:
+            return [], driver.title
         
+    def _heal_with_breadcrumbs(self, root, url, crumbs, page_title):
         if not crumbs:
-            new_node = DocNode(title=driver.title, url=url, level=1)
+            new_node = DocNode(title=page_title, url=url, level=1)
             root.children.append(new_node)
             return root
             
@@ -1,11 +1,14 @@
 
 import asyncio
+import functools
 import logging
+from operator import itemgetter
 from typing import List, Dict, Optional, Set
 from urllib.parse import urlparse
 
 from strategies.hierarchy_manager import HierarchyManager
 from strategies.universal_manager import UniversalManager
+from utils.url_utils import page_url
 
 logger = logging.getLogger(__name__)
 
@@ -18,15 +21,20 @@ class FusionManager:
     3. Heuristic (Deep link fallback)
     """
 
-    def __init__(self, use_selenium: bool = True):
+    def __init__(self, use_selenium: bool = True, cache=None, discovery_timeout: float = 90):
         self.use_selenium = use_selenium
         self.hierarchy_manager = HierarchyManager(use_selenium=use_selenium)
-        self.universal_manager = UniversalManager(use_selenium=use_selenium)
+        self.universal_manager = UniversalManager(use_selenium=use_selenium, cache=cache)
         self.diagnostics = {
             "sources": {},
             "merged_count": 0,
             "fusion_method": "hybrid"
         }
+        self._sitemap_tasks = {}  # base_url -> shared sitemap fetch task
+        # Deadline (seconds) for the heuristic scan, the only source the merge can do without
+        self.discovery_timeout = discovery_timeout
+        # HierarchyManager accumulates into one hierarchy_map; one Selenium crawl at a time
+        self._sidebar_lock = asyncio.Lock()
 
     async def build_hierarchy(self, base_url: str) -> List[Dict]:
         """
@@ -34,18 +42,25 @@ class FusionManager:
         """
         logger.info(f"🚀 [Fusion] Starting Ultimate Fusion discovery for {base_url}")
         
-        # Start parallel discovery
-        tasks = [
-            self._get_sitemap_urls(base_url),
-            self._get_sidebar_map(base_url),
-            self._get_heuristic_nodes(base_url)
-        ]
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        sitemap_urls = results[0] if not isinstance(results[0], Exception) else set()
-        sidebar_map = results[1] if not isinstance(results[1], Exception) else {}
-        heuristic_nodes = results[2] if not isinstance(results[2], Exception) else []
+        # Start parallel discovery. Only the heuristic scan has a deadline: the sidebar is the
+        # sole source of reading order and titles, and the downloader awaits the shared
+        # sitemap fetch in full anyway (seed_urls), so cutting either short only loses pages
+        # or structure without saving work.
+        sitemap_task = asyncio.ensure_future(self._get_sitemap_urls(base_url))
+        tasks = {
+            'sidebar': asyncio.ensure_future(self._get_sidebar_map(base_url)),
+            'heuristic': asyncio.ensure_future(self._get_heuristic_nodes(base_url))
+        }
+        _, pending = await asyncio.wait([tasks['heuristic']], timeout=self.discovery_timeout)
+        if pending:
+            tasks['heuristic'].cancel()
+            self.diagnostics['sources']['heuristic'] = 'timed_out'
+            logger.warning(f"⏱️ [Fusion] heuristic discovery timed out after {self.discovery_timeout}s; merging without it")
+        await asyncio.wait([sitemap_task, tasks['sidebar']])
+
+        sitemap_urls = self._task_result(sitemap_task, set())
+        sidebar_map = self._task_result(tasks['sidebar'], {})
+        heuristic_nodes = self._task_result(tasks['heuristic'], [])
 
         logger.info(f"📊 [Fusion] Discovery results: Sitemap={len(sitemap_urls)}, Sidebar={len(sidebar_map)}, Heuristic={len(heuristic_nodes)}")
 
@@ -64,42 +79,74 @@ class FusionManager:
             }
 
         # 2. Process Sitemap URLs (Fill missing pages)
-        for url in sitemap_urls:
-            c_url = self._canonical_url(url)
-            if c_url not in merged_map:
-                # Estimate depth from path
-                depth = self._estimate_depth(url, base_url)
-                merged_map[c_url] = {
-                    'url': url,
-                    'title': self._title_from_url(url),
-                    'depth': depth,
-                    'order': 9999 + depth, # Put at end but preserve relative depth order
-                    'source': 'sitemap'
-                }
+        # Canonicalize once; duplicates collapse and sidebar pages drop out in one set difference
+        known = set(merged_map)
+        sitemap_canon = {self._canonical_url(url): url for url in sitemap_urls}
+        sitemap_missing = sitemap_canon.keys() - known
+        if not sitemap_missing:
+            logger.debug("[Fusion] Sidebar covers every sitemap URL; nothing to fill from sitemap")
+        base_path = urlparse(base_url).path.strip('/') if sitemap_missing else ''
+        for c_url in sitemap_missing:
+            url = sitemap_canon[c_url]
+            # Estimate depth and title from the path, parsed once per URL
+            url_path = urlparse(url).path.strip('/')
+            depth = self._depth_from_path(url_path, base_path)
+            merged_map[c_url] = {
+                'url': url,
+                'title': self._title_from_path(url_path),
+                'depth': depth,
+                'order': 9999 + depth, # Put at end but preserve relative depth order
+                'source': 'sitemap'
+            }
 
         # 3. Process Heuristic nodes (Discovery backup)
-        for node in heuristic_nodes:
-            c_url = self._canonical_url(node['url'])
-            if c_url not in merged_map:
-                merged_map[c_url] = {
-                    'url': node['url'],
-                    'title': node['title'],
-                    'depth': node['depth'],
-                    'order': 20000 + node['depth'],
-                    'source': 'heuristic'
-                }
+        # reversed(): the first node seen for a canonical URL wins, as before
+        heuristic_canon = {self._canonical_url(node['url']): node for node in reversed(heuristic_nodes)}
+        for c_url in heuristic_canon.keys() - known - sitemap_canon.keys():
+            node = heuristic_canon[c_url]
+            merged_map[c_url] = {
+                'url': node['url'],
+                'title': node['title'],
+                'depth': node['depth'],
+                'order': 20000 + node['depth'],
+                'source': 'heuristic'
+            }
 
         # Convert back to sorted list
-        final_nodes = sorted(merged_map.values(), key=lambda x: (x['order'], x['url']))
+        # The merged dicts are the output nodes themselves; itemgetter keeps the key in C
+        final_nodes = sorted(merged_map.values(), key=itemgetter('order', 'url'))
         
         logger.info(f"✅ [Fusion] Successfully merged {len(final_nodes)} unique pages.")
         return final_nodes
 
+    async def seed_urls(self, base_url: str) -> Set[str]:
+        """
+        Sitemap URLs, available long before the sidebar is parsed.
+        Shares one fetch with build_hierarchy so callers can start work early.
+        """
+        return await self._get_sitemap_urls(base_url)
+
     async def _get_sitemap_urls(self, base_url: str) -> Set[str]:
-        return await self.universal_manager._fetch_all_urls_from_sitemap(f"{base_url}/sitemap.xml")
+        task = self._sitemap_tasks.get(base_url)
+        if task is None:
+            task = asyncio.ensure_future(
+                self.universal_manager._fetch_all_urls_from_sitemap(f"{base_url}/sitemap.xml")
+            )
+            self._sitemap_tasks[base_url] = task
+        return await asyncio.shield(task)
 
     async def _get_sidebar_map(self, base_url: str) -> Dict:
-        return self.hierarchy_manager.build_hierarchy(base_url)
+        # build_hierarchy is blocking Selenium work; run it off the loop so the
+        # sitemap fetch and heuristic scan actually overlap with it
+        async with self._sidebar_lock:
+            crawl = asyncio.ensure_future(asyncio.to_thread(self.hierarchy_manager.build_hierarchy, base_url))
+            try:
+                return await asyncio.shield(crawl)
+            except asyncio.CancelledError:
+                # The thread itself cannot be cancelled: keep the lock until it stops using
+                # its pooled driver and writing to hierarchy_map
+                await asyncio.gather(crawl, return_exceptions=True)
+                raise
 
     async def _get_heuristic_nodes(self, base_url: str) -> List[Dict]:
         # UniversalManager.build_hierarchy(base_url) actually does sitemap + heuristic
@@ -108,19 +155,26 @@ class FusionManager:
         nodes = await self.universal_manager._heuristic_scan(base_url)
         return [self.universal_manager._node_to_dict(n) for n in nodes]
 
-    def _canonical_url(self, url: str) -> str:
+    @staticmethod
+    def _task_result(task, default):
+        """A discovery task's result, or `default` if it failed, timed out or was cancelled"""
+        if not task.done() or task.cancelled() or task.exception() is not None:
+            return default
+        return task.result()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _canonical_url(url: str) -> str:
         """Strip protocol and trailing slashes for key matching"""
-        url = url.split('#')[0].split('?')[0].rstrip('/')
+        url = page_url(url)
         if '://' in url:
             url = url.split('://', 1)[1]
         if url.startswith('www.'):
             url = url[4:]
         return url.lower()
 
-    def _estimate_depth(self, url: str, base_url: str) -> int:
-        base_path = urlparse(base_url).path.strip('/')
-        url_path = urlparse(url).path.strip('/')
-        
+    @staticmethod
+    def _depth_from_path(url_path: str, base_path: str) -> int:
         if not url_path or url_path == base_path:
             return 0
             
@@ -130,8 +184,8 @@ class FusionManager:
             
         return len(url_path.split('/'))
 
-    def _title_from_url(self, url: str) -> str:
-        path = urlparse(url).path.strip('/')
+    @staticmethod
+    def _title_from_path(path: str) -> str:
         if not path:
             return "Introduction"
         slug = path.split('/')[-1]
@@ -4,29 +4,44 @@ GitHub Strategy - Clone source repository when available
 
 import asyncio
 import aiohttp
+import hashlib
+import re
 import git
 import shutil
 from pathlib import Path
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+from utils.http_session import SharedSession
 from utils.logger import get_logger
 
+# "# Title" line (surrounding whitespace ignored); [^\S\n] keeps matches within one line
+_H1_RE = re.compile(r'^[^\S\n]*# [^\S\n]*(\S.*?)[^\S\n]*$', re.M)
+# Fast path for _detect_github_repo: first quoted href pointing at a GitHub blob, no parse needed
+_GITHUB_BLOB_HREF_RE = re.compile(r'href\s*=\s*["\']([^"\']*github\.com[^"\']*/blob/[^"\']*)["\']', re.I)
+GITHUB_BLOB_HREF_XPATH = etree.XPath("//a[contains(@href, 'github.com') and contains(@href, '/blob/')]/@href")
+
 class GitHubStrategy:
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, cache=None):
         self.verbose = verbose
         self.logger = get_logger()
+        # Optional DiskCache: remembers detected repos and keeps clones between runs
+        self.cache = cache
+        self._http = SharedSession(limit=32, keepalive_timeout=60)
+
+    async def close(self):
+        await self._http.close()
 
     async def extract_pages(self, url, section_path=None):
         """Extract pages by cloning GitHub repository"""
         try:
             # Step 1: Detect GitHub repository
-            repo_url = await self._detect_github_repo(url)
+            repo_url = await self._find_repo(url)
             if not repo_url:
                 return None
 
-            # Step 2: Clone repository
-            repo_dir = Path('temp_repo')
-            await self._clone_repo(repo_url, repo_dir)
+            # Step 2: Clone repository (or refresh a cached clone)
+            repo_dir = await self._prepare_repo(repo_url, section_path)
 
             # Step 3: Find markdown files
             pages = await self._extract_markdown_files(repo_dir, section_path)
@@ -37,55 +52,142 @@ class GitHubStrategy:
             self.logger.debug(f"GitHub strategy error: {e}")
             return None
 
+    async def _find_repo(self, url):
+        """Detected repo URL, remembered across runs when a cache is configured"""
+        key = f"github:repo:{url}"
+        if self.cache:
+            repo_url = self.cache.get(key)
+            if repo_url:
+                return repo_url
+
+        repo_url = await self._detect_github_repo(url)
+        # Only hits are cached: a miss may just be a transient network error
+        if self.cache and repo_url:
+            self.cache.set(key, repo_url)
+        return repo_url
+
+    async def _prepare_repo(self, repo_url, section_path=None):
+        """
+        Without a cache: fresh clone into temp_repo (removed by the downloader's cleanup).
+        With a cache: one clone per (repo, section) under the cache dir, reused as-is within
+        the TTL and refreshed with fetch + reset once it expires.
+        """
+        if not self.cache:
+            repo_dir = Path('temp_repo')
+            await self._clone_repo(repo_url, repo_dir, section_path)
+            return repo_dir
+
+        clone_key = f"{repo_url}|{section_path or ''}"
+        repo_dir = self.cache.cache_dir / 'repos' / hashlib.sha1(clone_key.encode('utf-8')).hexdigest()[:16]
+        stamp_key = f"github:clone:{clone_key}"
+
+        if (repo_dir / '.git').exists():
+            if self.cache.get(stamp_key) is not None:
+                self.logger.debug(f"Reusing cached clone {repo_dir}")
+                return repo_dir
+            try:
+                await self._run_git('fetch', '--depth=1', 'origin', cwd=repo_dir)
+                await self._run_git('reset', '--hard', 'FETCH_HEAD', cwd=repo_dir)
+                self.cache.set(stamp_key, str(repo_dir))
+                return repo_dir
+            except Exception as e:
+                self.logger.debug(f"Refreshing cached clone failed, recloning: {e}")
+
+        await self._clone_repo(repo_url, repo_dir, section_path)
+        self.cache.set(stamp_key, str(repo_dir))
+        return repo_dir
+
     async def _detect_github_repo(self, url):
         """Detect GitHub repository from GitBook page"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(30)) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        return None
-
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-
-                    # Look for GitHub links
-                    github_selectors = [
-                        'a[href*="github.com"]',
-                        'a[aria-label*="Edit"]',
-                        'a[title*="GitHub"]'
-                    ]
-
-                    for selector in github_selectors:
-                        links = soup.select(selector)
-                        for link in links:
-                            href = link.get('href', '')
-                            if 'github.com' in href and '/blob/' in href:
-                                # Extract repo URL from blob link
-                                parts = href.split('/blob/')
-                                if len(parts) >= 2:
-                                    repo_url = parts[0] + '.git'
-                                    self.logger.debug(f"Found repo: {repo_url}")
-                                    return repo_url
-
+            session = await self._http.get()
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status != 200:
                     return None
 
+                html = await response.text()
+
+                # Look for GitHub "edit" links (blob URLs). A regex scan over the raw HTML
+                # finds the usual quoted href without building a tree at all
+                m = _GITHUB_BLOB_HREF_RE.search(html)
+                if m:
+                    repo_url = m.group(1).split('/blob/')[0] + '.git'
+                    self.logger.debug(f"Found repo: {repo_url}")
+                    return repo_url
+
+                # Unquoted or otherwise unusual markup: fall back to a real parse
+                for href in GITHUB_BLOB_HREF_XPATH(lxml_html.fromstring(html)):
+                    # Extract repo URL from blob link
+                    repo_url = href.split('/blob/')[0] + '.git'
+                    self.logger.debug(f"Found repo: {repo_url}")
+                    return repo_url
+
+                return None
+
         except Exception as e:
             self.logger.debug(f"GitHub detection error: {e}")
             return None
 
-    async def _clone_repo(self, repo_url, repo_dir):
+    async def _clone_repo(self, repo_url, repo_dir, section_path=None):
         """Clone GitHub repository"""
         if repo_dir.exists():
             shutil.rmtree(repo_dir)
 
+        # Markdown-only partial clone first; older git (no --filter/--sparse) falls back below
         try:
-            git.Repo.clone_from(repo_url, repo_dir, depth=1, branch='main')
-        except:
+            await self._sparse_clone(repo_url, repo_dir, section_path)
+            return
+        except Exception as e:
+            self.logger.debug(f"Sparse clone failed, falling back to full clone: {e}")
+            if repo_dir.exists():
+                shutil.rmtree(repo_dir)
+
+        # GitPython blocks; keep it off the loop so racing strategies keep running
+        try:
+            await self._clone_in_thread(repo_url, repo_dir, 'main')
+        except Exception:
             try:
-                git.Repo.clone_from(repo_url, repo_dir, depth=1, branch='master')
+                await self._clone_in_thread(repo_url, repo_dir, 'master')
             except Exception as e:
                 raise Exception(f"Failed to clone {repo_url}: {e}")
 
+    async def _clone_in_thread(self, repo_url, repo_dir, branch):
+        clone = asyncio.ensure_future(
+            asyncio.to_thread(git.Repo.clone_from, repo_url, repo_dir, depth=1, branch=branch)
+        )
+        try:
+            await asyncio.shield(clone)
+        except asyncio.CancelledError:
+            # The thread cannot be stopped: don't report cancelled (and let the caller
+            # clean up repo_dir) while it is still writing there
+            await asyncio.gather(clone, return_exceptions=True)
+            raise
+
+    async def _sparse_clone(self, repo_url, repo_dir, section_path=None):
+        """Shallow blob-less clone of the default branch that only checks out .md files"""
+        await self._run_git('clone', '--filter=blob:none', '--sparse', '--depth=1', repo_url, str(repo_dir))
+
+        if section_path:
+            patterns = [f"/{section_path.strip('/')}/**/*.md"]
+        else:
+            patterns = ['*.md']
+        await self._run_git('sparse-checkout', 'set', '--no-cone', *patterns, cwd=repo_dir)
+
+    async def _run_git(self, *args, cwd=None):
+        proc = await asyncio.create_subprocess_exec(
+            'git', *args, cwd=cwd,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            # Cancelled (e.g. another strategy won the race): don't leave git running
+            proc.kill()
+            await proc.wait()
+            raise
+        if proc.returncode != 0:
+            raise Exception(f"git {args[0]} failed: {stderr.decode(errors='replace').strip()}")
+
     async def _extract_markdown_files(self, repo_dir, section_path=None):
         """Extract markdown files from repository"""
         pages = []
@@ -98,32 +200,57 @@ class GitHubStrategy:
                 self.logger.warning(f"Section path not found: {section_path}")
                 return []
 
-        # Find all markdown files
-        md_files = list(search_dir.rglob('*.md'))
+        # Walk the tree in a thread and stream paths to reader tasks, so reading starts
+        # with the first file found instead of after the full rglob
+        loop = asyncio.get_running_loop()
+        md_queue = asyncio.Queue(maxsize=256)
+        workers = 16
+        found = []  # (walk index, page); sorted at the end to keep rglob order
 
-        for md_file in md_files:
+        def walk():
+            for index, md_file in enumerate(search_dir.rglob('*.md')):
+                asyncio.run_coroutine_threadsafe(md_queue.put((index, md_file)), loop).result()
+
+        async def produce():
             try:
-                content = md_file.read_text(encoding='utf-8')
-                relative_path = md_file.relative_to(repo_dir)
+                await asyncio.to_thread(walk)
+            finally:
+                for _ in range(workers):
+                    await md_queue.put(None)
 
-                pages.append({
+        async def consume():
+            while (item := await md_queue.get()) is not None:
+                index, md_file = item
+                try:
+                    content = await asyncio.to_thread(md_file.read_text, encoding='utf-8')
+                except Exception as e:
+                    self.logger.warning(f"Error reading {md_file}: {e}")
+                    continue
+
+                relative_path = md_file.relative_to(repo_dir)
+                found.append((index, {
                     'title': self._extract_title(content) or md_file.stem.replace('-', ' ').replace('_', ' ').title(),
                     'url': str(md_file),
                     'content': content,
                     'source': 'github',
                     'path': str(relative_path)
-                })
+                }))
 
-            except Exception as e:
-                self.logger.warning(f"Error reading {md_file}: {e}")
+        await asyncio.gather(produce(), *(consume() for _ in range(workers)))
+
+        found.sort(key=lambda item: item[0])
+        pages.extend(page for _, page in found)
 
         return pages
 
     def _extract_title(self, content):
         """Extract title from markdown content"""
-        lines = content.split('\n')
-        for line in lines[:10]:  # Check first 10 lines
-            line = line.strip()
-            if line.startswith('# '):
-                return line[2:].strip()
-        return None
+        # Only the first 10 lines are checked; find where they end instead of splitting the file
+        end = -1
+        for _ in range(10):
+            end = content.find('\n', end + 1)
+            if end < 0:
+                end = len(content)
+                break
+        match = _H1_RE.search(content, 0, end)
+        return match.group(1) if match else None
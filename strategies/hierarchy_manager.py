@@ -1,10 +1,74 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from urllib.parse import urljoin, urlparse
 from utils.logger import get_logger
+from utils.url_utils import page_url
+from utils.driver_manager import DriverManager
+from lxml import etree
+from lxml import html as lxml_html
 import time
 
+# Precompiled sidebar queries for _parse_dom_tree
+TOC_CONTAINER_XPATH = etree.XPath("descendant-or-self::div[@data-testid='toc-scroll-container']")
+DIRECT_LI_XPATH = etree.XPath("./li")
+HAS_LINK_XPATH = etree.XPath("boolean(.//a)")
+
+def _first(nodes):
+    return nodes[0] if nodes else None
+
+def _li_parts(li):
+    """Single pass over an LI's children: (first a, else first div's first a; direct divs)"""
+    direct_a = None
+    divs = []
+    for child in li.iterchildren('a', 'div'):
+        if child.tag == 'a':
+            if direct_a is None:
+                direct_a = child
+        else:
+            divs.append(child)
+    if direct_a is None and divs:
+        direct_a = next(divs[0].iterchildren('a'), None)
+    return direct_a, divs
+
+def _text(el):
+    """Equivalent of BeautifulSoup get_text(strip=True)"""
+    return ''.join(t.strip() for t in el.itertext())
+
+# One expansion pass: click every collapsed chevron in the sidebar and mark the clicked
+# toggles; returns [collapsed found, clicked]
+EXPAND_PASS_JS = """
+const icons = arguments[0].querySelectorAll('svg.rotate-0');
+let clicked = 0;
+icons.forEach(icon => {
+    try {
+        icon.parentNode.click();
+        icon.parentNode.setAttribute('data-expand-pending', '');
+        clicked++;
+    } catch (e) {}
+});
+window.scrollTo(0, document.body.scrollHeight);
+return [icons.length, clicked];
+"""
+
+# [clicked toggles whose chevron has not flipped yet, collapsed chevrons in the sidebar]
+SETTLE_STATE_JS = """
+const root = arguments[0];
+let waiting = 0;
+root.querySelectorAll('[data-expand-pending]').forEach(el => {
+    if (el.querySelector(':scope > svg.rotate-0')) {
+        waiting++;
+    } else {
+        el.removeAttribute('data-expand-pending');
+    }
+});
+return [waiting, root.querySelectorAll('svg.rotate-0').length];
+"""
+
+# Rendered sidebar: the GitBook TOC list, or any nav-like container with links
+SIDEBAR_READY_SELECTOR = "div[data-testid='toc-scroll-container'] ul, nav a, aside a"
+
 class HierarchyManager:
     def __init__(self, use_selenium=True, verbose=False):
         self.use_selenium = use_selenium
@@ -22,19 +86,15 @@ class HierarchyManager:
         
         driver = None
         try:
-            options = Options()
-            options.add_argument('--headless')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            # Suppress logs
-            options.add_argument('--log-level=3')
-            options.add_argument('--window-size=1920,1080')
-
-            driver = webdriver.Chrome(options=options)
+            # Pooled Chrome: startup is paid once across sites/sections, not per call
+            driver = DriverManager().checkout()
             driver.get(start_url)
             
-            # Allow dynamic content to load
-            time.sleep(3)
+            # Allow dynamic content to load: return as soon as a sidebar list is rendered
+            try:
+                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, SIDEBAR_READY_SELECTOR)))
+            except TimeoutException:
+                self.logger.debug("Sidebar not detected after 10s, continuing anyway")
             
             # Find the best sidebar candidate
             # Simple selectors might catch breadcrumbs or top-nav
@@ -82,7 +142,7 @@ class HierarchyManager:
             return {}
         finally:
             if driver:
-                driver.quit()
+                DriverManager().checkin(driver)
 
     def _expand_sidebar(self, driver, sidebar):
         """Recursively expand all collapsed items in the sidebar using 'rotate-0' heuristic"""
@@ -96,54 +156,47 @@ class HierarchyManager:
             iteration += 1
             
             # Find SVGs with 'rotate-0' which indicates a collapsed state in this GitBook theme
-            # Note: We must re-query every time because clicking changes the DOM
+            # and click all of them in one script call (re-queried every pass because clicking
+            # changes the DOM). Scrolling to the bottom triggers lazy-loaded sections.
             try:
-                # Target SVGs that have 'rotate-0' class.
-                # Use a specific selector to avoid non-sidebar arrows if any
-                collapsed_icons = sidebar.find_elements(By.CSS_SELECTOR, "svg.rotate-0")
+                found, clicked_in_this_pass = driver.execute_script(EXPAND_PASS_JS, sidebar)
                 
-                if not collapsed_icons:
+                if not found:
                     self.logger.debug("  No more collapsed items found.")
                     break
                 
-                clicked_in_this_pass = 0
-                
-                for icon in collapsed_icons:
-                    try:
-                        # SVGs might report as not displayed in Selenium, so skip check
-                        # or check parent.
-                        
-                        # Scroll to element to ensure it's in viewport
-                        driver.execute_script("arguments[0].scrollIntoView({block: 'center', inline: 'nearest'});", icon)
-                        time.sleep(0.1)
-                        
-                        # Try standard click first
-                        try:
-                            icon.click()
-                        except:
-                            # Fallback to JS click on parent if SVG click fails
-                            driver.execute_script("arguments[0].parentNode.click();", icon)
-                            
-                        clicked_in_this_pass += 1
-                        time.sleep(0.1) # Small delay for animation
-                    except Exception as e:
-                        # Stale element or intercepted
-                        pass
-                
                 if clicked_in_this_pass == 0:
                     # If we found items but couldn't click any, break to avoid infinite loop
-                     self.logger.debug("  Found collapsed items but could not click any.")
-                     break
+                    self.logger.debug("  Found collapsed items but could not click any.")
+                    break
                      
                 self.logger.info(f"  [Pass {iteration}] Expanded {clicked_in_this_pass} items")
                 
-                # Wait for content to load/animate
-                time.sleep(0.5)
+                # Wait for content to load/animate: until the collapsed count stops changing
+                self._wait_for_settle(driver, sidebar)
                 
             except Exception as e:
                 self.logger.warning(f"  Expansion error: {e}")
                 break
 
+    def _wait_for_settle(self, driver, sidebar, timeout=2.0, interval=0.1, stable_polls=3):
+        """
+        Poll until every clicked toggle has flipped open and the collapsed-icon count has
+        read the same `stable_polls` times in a row (or timeout), so the next pass never
+        clicks a toggle the framework has not re-rendered yet.
+        """
+        deadline = time.monotonic() + timeout
+        last = None
+        stable = 0
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            waiting, count = driver.execute_script(SETTLE_STATE_JS, sidebar)
+            stable = stable + 1 if count == last else 1
+            last = count
+            if not waiting and stable >= stable_polls:
+                return
+        self.logger.debug("  Sidebar still changing after expansion pass; continuing")
+
     def _parse_dom_tree(self, root_element, base_url):
         """
         Parses the DOM tree using Strict Recursion based on user specification.
@@ -151,112 +204,104 @@ class HierarchyManager:
         Nodes: li -> Type A (Leaf) or Type B (Group)
         Recursion: Find nested ul in li subtree
         """
-        from bs4 import BeautifulSoup
         html = root_element.get_attribute('outerHTML')
-        soup = BeautifulSoup(html, 'html.parser')
+        root = lxml_html.fromstring(html)
         
         # 1. Locate Root Container
         # Strict Selector: div[data-testid="toc-scroll-container"]
-        container = soup.find('div', {'data-testid': 'toc-scroll-container'})
+        container = _first(TOC_CONTAINER_XPATH(root))
         
-        if not container:
+        if container is None:
             self.logger.warning("Strict Parsing: 'toc-scroll-container' not found! Falling back to root soup.")
-            container = soup
+            container = root
             
         # 2. Find First Top-Level UL
-        root_ul = container.find('ul')
-        if not root_ul:
+        root_ul = next(container.iter('ul'), None)
+        if root_ul is None:
              self.logger.warning("Strict Parsing: No root UL found in container.")
              return
 
-        # 3. Recursive Parsing Function
+        # 3. Strict Parsing
         order_counter = 0
 
         def clean_url(u):
             if not u: return ""
-            u = urljoin(base_url, u)
-            u = u.split('#')[0]
-            return u
+            # Same key get_info() looks up with
+            return page_url(urljoin(base_url, u))
 
-        def parse_recursive(ul_node, level=0, current_section=None):
-            nonlocal order_counter
-            
+        # Explicit stack of (LI iterator, level, section) instead of recursion. Items are
+        # still numbered in document pre-order, so 'order' values are unchanged.
+        self.logger.info("Starting Strict Parsing...")
+        stack = [(iter(DIRECT_LI_XPATH(root_ul)), 1, None)]
+        while stack:
             # Iterate all LI children (Strict Hierarchy)
-            # Usage of recursive=False ensures we process this list's items only
-            list_items = ul_node.find_all('li', recursive=False)
-            
-            for li in list_items:
-                # Determine Node Type
-                
-                # Search for direct link (Type A)
-                node_type = None
-                title = None
-                url = None
+            # Direct children only: we process this list's items only
+            list_items, level, current_section = stack[-1]
+            li = next(list_items, None)
+            if li is None:
+                stack.pop()
+                continue
+
+            # Determine Node Type
                 
-                # Direct Link check (Type A)
-                # Look for 'a' that is a direct child OR inside a wrapper div but "conceptually" direct
-                # User strict mode: li > a (Leaf)
-                direct_a = li.find('a', recursive=False)
+            # Search for direct link (Type A)
+            node_type = None
+            title = None
+            url = None
                 
-                # If not direct child, sometimes it's wrapped in div. 
-                # e.g. li > div > a. But we must be careful not to mistake a nested list link.
-                if not direct_a:
-                     direct_wrapper = li.find('div', recursive=False)
-                     if direct_wrapper:
-                         direct_a = direct_wrapper.find('a', recursive=False)
+            # Direct Link check (Type A)
+            # Look for 'a' that is a direct child OR inside a wrapper div but "conceptually" direct
+            # User strict mode: li > a (Leaf)
+            # If not direct child, sometimes it's wrapped in div. 
+            # e.g. li > div > a. But we must be careful not to mistake a nested list link.
+            direct_a, divs = _li_parts(li)
 
-                if direct_a:
-                    node_type = 'A'
-                    title = direct_a.get_text(strip=True)
-                    url = direct_a.get('href')
-                else:
-                    # Group Header check (Type B)
-                    # li > div (Text)
-                    # Find first div direct child that has text
-                    # (And verify it's not just a wrapper for ul?)
-                    for child in li.find_all('div', recursive=False):
-                         # If this div has text and NO 'a', treat as title
-                         if not child.find('a'):
-                             text = child.get_text(strip=True)
-                             if text:
-                                  node_type = 'B'
-                                  title = text
-                                  break
+            if direct_a is not None:
+                node_type = 'A'
+                title = _text(direct_a)
+                url = direct_a.get('href')
+            else:
+                # Group Header check (Type B)
+                # li > div (Text)
+                # Find first div direct child that has text
+                # (And verify it's not just a wrapper for ul?)
+                for child in divs:
+                     # If this div has text and NO 'a', treat as title
+                     if not HAS_LINK_XPATH(child):
+                         text = _text(child)
+                         if text:
+                              node_type = 'B'
+                              title = text
+                              break
                 
-                # Process Node Data
-                cleaned_url = None
-                if node_type == 'A' and url:
-                    cleaned_url = clean_url(url)
-                    if cleaned_url and cleaned_url not in self.hierarchy_map:
-                         self.hierarchy_map[cleaned_url] = {
-                            'title': title,           # CRITICAL FIX: Save the title!
-                            'level': level,
-                            'order': order_counter,
-                            'section': current_section
-                        }
-                         order_counter += 1
+            # Process Node Data
+            cleaned_url = None
+            if node_type == 'A' and url:
+                cleaned_url = clean_url(url)
+                if cleaned_url and cleaned_url not in self.hierarchy_map:
+                     self.hierarchy_map[cleaned_url] = {
+                        'title': title,           # CRITICAL FIX: Save the title!
+                        'level': level,
+                        'order': order_counter,
+                        'section': current_section
+                    }
+                     order_counter += 1
                 
-                # Determine Nested Section Context
-                next_section = current_section
-                if node_type == 'B':
-                    next_section = title
-                    self.logger.debug(f"  [Group] Found Section: {title}")
+            # Determine Nested Section Context
+            next_section = current_section
+            if node_type == 'B':
+                next_section = title
+                self.logger.debug(f"  [Group] Found Section: {title}")
                 
-                # Recursion Logic
-                # Check for nested UL anywhere in subtree
-                # Use find() to get the *first* nested UL.
-                nested_ul = li.find('ul') 
-                if nested_ul:
-                     parse_recursive(nested_ul, level + 1, next_section)
+            # Descend: the nested list is finished before the next sibling LI (pre-order)
+            # Check for nested UL anywhere in subtree; iterdescendants stops at the first one
+            nested_ul = next(li.iterdescendants('ul'), None)
+            if nested_ul is not None:
+                 stack.append((iter(DIRECT_LI_XPATH(nested_ul)), level + 1, next_section))
 
-        # Start Recursion
-        self.logger.info("Starting Strict Recursive Parsing...")
-        parse_recursive(root_ul, level=1, current_section=None)
 
         
     def get_info(self, url):
         """Get hierarchy info for a URL"""
-        # normalize url
-        # remove anchor, query
-        u = url.split('#')[0].split('?')[0]
-        return self.hierarchy_map.get(u)
+        # normalize url the same way keys were stored: no anchor, query or trailing slash
+        return self.hierarchy_map.get(page_url(url))
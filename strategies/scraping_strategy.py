@@ -5,20 +5,82 @@ Enhanced Scraping Strategy - Web scraping with navigation discovery
 import asyncio
 import aiohttp
 import re
+import time
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
 from utils.logger import get_logger
+from utils.http_session import SharedSession
+from utils.rate_limiter import RateLimiter
+from utils.url_utils import page_url
 
 # Import selenium dependencies lazily or checkIfAvailable
 try:
     from selenium import webdriver
-    from selenium.webdriver.chrome.options import Options
     from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
+    from utils.driver_manager import DriverManager
 except ImportError:
     webdriver = None
 
+# Non-content URLs, fused into one pattern checked per discovered link
+_SKIP_URL_RE = re.compile('|'.join(f'(?:{p})' for p in [
+    r'/search', r'/login', r'/logout', r'/edit',
+    r'/admin', r'/api/', r'/assets/', r'/static/',
+    r'\.(css|js|json|xml|rss|txt)$',
+    r'\.(jpg|png|gif|svg|ico|pdf)$',
+    r'mailto:', r'tel:', r'javascript:'
+]))
+
+_EXCESS_NEWLINES_RE = re.compile(r'\n{3,}')
+# Rendered text size of the content container; SPAs keep filling it after the load event
+CONTENT_LENGTH_JS = (
+    "var el = document.querySelector('main, article, .content') || document.body;"
+    "return el ? el.textContent.length : 0;"
+)
+# Upper bound on the text kept from one page
+MAX_CONTENT_CHARS = 2_000_000
+
+# Page chrome dropped before extraction and the content containers, in priority order.
+# Compiled once instead of re-parsing the CSS on every page.
+_UNWANTED = ', '.join([
+    'nav', 'header', 'footer', 'aside',
+    '.sidebar', '.navigation', '.nav', '.header', '.footer',
+    '.breadcrumb', '.breadcrumbs', '.page-edit-link',
+    'script', 'style', 'noscript',
+    '.search', '.share', '.comments'
+])
+_CONTENT = [
+    '[data-testid="page-content"]',
+    '.page-content',
+    '.content',
+    'main',
+    'article',
+    '.post-content',
+    '.entry-content'
+]
+UNWANTED_SELECTOR = sv.compile(_UNWANTED)
+KATEX = sv.compile('.katex')
+KATEX_TEX_ANNOTATION = sv.compile('annotation[encoding="application/x-tex"]')
+KATEX_DISPLAY = sv.compile('.katex-display')
+# Chrome, KaTeX and leftover KaTeX HTML are all collected by one tree walk
+PAGE_CLEANUP_SELECTOR = sv.compile(f'{_UNWANTED}, .katex, .katex-html')
+# Any content container (one walk); CONTENT_SELECTORS ranks the candidates
+CONTENT_SELECTOR = sv.compile(', '.join(_CONTENT))
+CONTENT_SELECTORS = [sv.compile(sel) for sel in _CONTENT]
+
+# Navigation discovery only needs the layout containers the nav selectors are scoped to.
+# The strainer applies to top-level elements, so <head> and body-level <script> blobs
+# (e.g. __NEXT_DATA__) are never built while every matched container keeps its subtree.
+NAV_STRAINER = SoupStrainer(['div', 'nav', 'aside', 'header', 'main', 'section', 'article', 'footer', 'ul', 'ol'])
+
+def _is_table_cell(node):
+    """<td>/<th> or an ARIA cell; text nodes have no name"""
+    if node.name is None:
+        return False
+    return node.name in ('td', 'th') or node.get('role') in ('cell', 'columnheader', 'gridcell')
+
 class ScrapingStrategy:
     def __init__(self, max_concurrent=15, delay=0.1, timeout=30, 
                  use_selenium=False, verbose=False):
@@ -28,6 +90,11 @@ class ScrapingStrategy:
         self.use_selenium = use_selenium
         self.verbose = verbose
         self.logger = get_logger()
+        # Connecting to a dead host fails fast; a stalled read cannot hold a slot past `timeout`
+        self._timeout = aiohttp.ClientTimeout(total=timeout, connect=min(10, timeout), sock_read=timeout)
+        self._http = SharedSession(self._timeout, limit=100, limit_per_host=max_concurrent)
+        # Browsers rendering SPA pages concurrently in download_with_selenium
+        self.selenium_workers = 4
 
         # Navigation selectors for different GitBook layouts
         self.nav_selectors = [
@@ -47,6 +114,10 @@ class ScrapingStrategy:
             '.toc a[href]',
             'aside a[href]',
         ]
+        self._nav_compiled = [sv.compile(selector) for selector in self.nav_selectors]
+
+    async def close(self):
+        await self._http.close()
 
     async def extract_pages(self, url, section_path=None):
         """Extract pages using web scraping"""
@@ -75,53 +146,50 @@ class ScrapingStrategy:
     async def _discover_navigation(self, url):
         """Discover navigation links from the main page"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        return []
-
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-
-                    links = []
-                    base_domain = urlparse(url).netloc
-
-                    # Try each navigation selector
-                    for selector in self.nav_selectors:
-                        nav_links = soup.select(selector)
-
-                        for link in nav_links:
-                            href = link.get('href', '')
-                            text = link.get_text().strip()
-
-                            if not href or not text:
-                                continue
-
-                            # Convert to absolute URL
-                            abs_url = urljoin(url, href)
-
-                            # Validate URL
-                            if self._is_valid_page_url(abs_url, base_domain):
-                                links.append({
-                                    'url': abs_url,
-                                    'title': text[:100]  # Limit title length
-                                })
-
-                        # If we found good links with this selector, use them
-                        if len(links) > 5:
-                            break
-
-                    # Remove duplicates
-                    unique_links = []
-                    seen_urls = set()
-
-                    for link in links:
-                        if link['url'] not in seen_urls:
-                            unique_links.append(link)
-                            seen_urls.add(link['url'])
-
-                    self.logger.info(f"Discovered {len(unique_links)} navigation links")
-                    return unique_links
+            session = await self._http.get()
+            async with session.get(url) as response:
+                if response.status != 200:
+                    return []
+
+                html = await response.text()
+                soup = BeautifulSoup(html, 'lxml', parse_only=NAV_STRAINER)
+
+                links = []
+                # Deduplicated as links are found: anchors and trailing slashes of one page
+                # collapse to a single fetch
+                seen_urls = set()
+                base_domain = urlparse(url).netloc
+
+                # Try each navigation selector
+                for selector in self._nav_compiled:
+                    nav_links = selector.select(soup)
+
+                    for link in nav_links:
+                        href = link.get('href', '')
+                        text = link.get_text().strip()
+
+                        if not href or not text:
+                            continue
+
+                        # Convert to absolute URL
+                        abs_url = page_url(urljoin(url, href))
+                        if abs_url in seen_urls:
+                            continue
+
+                        # Validate URL
+                        if self._is_valid_page_url(abs_url, base_domain):
+                            seen_urls.add(abs_url)
+                            links.append({
+                                'url': abs_url,
+                                'title': text[:100]  # Limit title length
+                            })
+
+                    # If we found good links with this selector, use them
+                    if len(links) > 5:
+                        break
+
+                self.logger.info(f"Discovered {len(links)} navigation links")
+                return links
 
         except Exception as e:
             self.logger.debug(f"Navigation discovery error: {e}")
@@ -139,44 +207,34 @@ class ScrapingStrategy:
             return False
 
         # Skip non-content URLs
-        skip_patterns = [
-            r'/search', r'/login', r'/logout', r'/edit',
-            r'/admin', r'/api/', r'/assets/', r'/static/',
-            r'\.(css|js|json|xml|rss|txt)$',
-            r'\.(jpg|png|gif|svg|ico|pdf)$',
-            r'mailto:', r'tel:', r'javascript:'
-        ]
-
-        url_lower = url.lower()
-        for pattern in skip_patterns:
-            if re.search(pattern, url_lower):
-                return False
-
-        return True
+        return not _SKIP_URL_RE.search(url.lower())
 
     async def _download_pages(self, nav_links):
         """Download content from all navigation links"""
         semaphore = asyncio.Semaphore(self.max_concurrent)
+        # Same request rate as one `delay` per slot (max_concurrent/delay per second), but
+        # starts are spread out instead of every slot idling a full delay before its request
+        limiter = RateLimiter(self.delay / self.max_concurrent)
         pages = []
 
         async def download_page(link):
             async with semaphore:
-                await asyncio.sleep(self.delay)
+                await limiter.wait()
 
                 try:
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                        async with session.get(link['url']) as response:
-                            if response.status == 200:
-                                html = await response.text()
-                                content, parsed_title = self._extract_main_content(html)
-
-                                if content and (len(content.strip()) > 50 or parsed_title):  # Minimum content length or has title
-                                    pages.append({
-                                        'title': parsed_title or link.get('title', 'Untitled Page'),
-                                        'url': link['url'],
-                                        'content': content,
-                                        'source': 'scraping'
-                                    })
+                    session = await self._http.get()
+                    async with session.get(link['url']) as response:
+                        if response.status == 200:
+                            html = await response.text()
+                            content, parsed_title = self._extract_main_content(html)
+
+                            if content and (len(content.strip()) > 50 or parsed_title):  # Minimum content length or has title
+                                pages.append({
+                                    'title': parsed_title or link.get('title', 'Untitled Page'),
+                                    'url': link['url'],
+                                    'content': content,
+                                    'source': 'scraping'
+                                })
 
                 except Exception as e:
                     self.logger.debug(f"Error downloading {link['url']}: {e}")
@@ -189,73 +247,49 @@ class ScrapingStrategy:
 
     def _extract_main_content(self, html):
         """Extract main content from HTML page"""
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Remove unwanted elements
-        unwanted_selectors = [
-            'nav', 'header', 'footer', 'aside', 
-            '.sidebar', '.navigation', '.nav', '.header', '.footer',
-            '.breadcrumb', '.breadcrumbs', '.page-edit-link',
-            'script', 'style', 'noscript',
-            '.search', '.share', '.comments'
-        ]
-
-        for selector in unwanted_selectors:
-            for element in soup.select(selector):
+        soup = BeautifulSoup(html, 'lxml')
+
+        # One tree walk finds chrome, KaTeX and katex-html. Chrome goes first (matches nested
+        # inside an already removed element are skipped), then formulas, then leftovers.
+        katex_elements, katex_html = [], []
+        for element in PAGE_CLEANUP_SELECTOR.select(soup):
+            if element.decomposed:
+                continue
+            if UNWANTED_SELECTOR.match(element):
                 element.decompose()
+            elif KATEX.match(element):
+                katex_elements.append(element)
+            else:
+                katex_html.append(element)
 
-        # Fix Math / KaTeX
-        # KaTeX often has an annotation tag with the source
-        # Structure: <span class="katex"><span class="katex-mathml"><math><semantics><annotation encoding="application/x-tex">SOURCE</annotation>...
-        katex_elements = soup.select('.katex')
         for k in katex_elements:
-            annotation = k.select_one('annotation[encoding="application/x-tex"]')
-            if annotation:
-                latex_source = annotation.get_text()
-                # Determine if block or inline? 
-                # Usually hard to tell, but we can default to inline for safety or double dollar for distinct blocks.
-                # If the parent is a paragraph or div by itself, maybe block.
-                # Let's try to detect current style. 
-                # GitBook often sets class 'katex-display' for block math.
-                is_display = 'katex-display' in k.get('class', []) or k.select_one('.katex-display')
-                
-                if is_display:
-                     k.replace_with(f"\n$$\n{latex_source}\n$$\n")
-                else:
-                     k.replace_with(f"${latex_source}$")
-            else:
-                # If no annotation, we might want to just unwrap or keep text?
-                # But typically the '.katex-html' part is what makes the garbage text.
-                # If we can't find source, proceed with care.
-                # Often removing .katex-html helps if there is a mathml fallback
-                pass
+            if not k.decomposed:
+                self._rewrite_katex(k)
 
-        # Also explicit removal of katex-html if we missed the replacement above 
+        # Also explicit removal of katex-html if we missed the replacement above
         # (e.g. if annotation was missing but katex structure exists)
-        for junk in soup.select('.katex-html'):
-             junk.decompose()
-
-        # Find main content area
-        content_selectors = [
-            '[data-testid="page-content"]',
-            '.page-content',
-            '.content',
-            'main',
-            'article',
-            '.post-content',
-            '.entry-content'
-        ]
-
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # TRY TO FIND TITLE HERE FIRST
-                h1 = content_elem.find('h1')
-                title = h1.get_text().strip() if h1 else None
-                
-                # Convert to markdown-like text
-                content = self._html_to_text(content_elem)
-                return content, title
+        for junk in katex_html:
+            if not junk.decomposed:
+                junk.decompose()
+
+        # Find main content area: the highest-priority container wins, document order breaks ties
+        content_elem, best_rank = None, len(CONTENT_SELECTORS)
+        for candidate in CONTENT_SELECTOR.select(soup):
+            for rank in range(best_rank):
+                if CONTENT_SELECTORS[rank].match(candidate):
+                    content_elem, best_rank = candidate, rank
+                    break
+            if best_rank == 0:
+                break
+
+        if content_elem:
+            # TRY TO FIND TITLE HERE FIRST
+            h1 = content_elem.find('h1')
+            title = h1.get_text().strip() if h1 else None
+
+            # Convert to markdown-like text
+            content = self._html_to_text(content_elem)
+            return content, title
 
         # Fallback - use body content
         body = soup.find('body')
@@ -264,61 +298,98 @@ class ScrapingStrategy:
 
         return soup.get_text(), None
 
+    def _rewrite_katex(self, k):
+        """Fix Math / KaTeX: replace a rendered formula with its LaTeX source"""
+        # KaTeX often has an annotation tag with the source
+        # Structure: <span class="katex"><span class="katex-mathml"><math><semantics><annotation encoding="application/x-tex">SOURCE</annotation>...
+        annotation = KATEX_TEX_ANNOTATION.select_one(k)
+        if annotation:
+            latex_source = annotation.get_text()
+            # Determine if block or inline? 
+            # Usually hard to tell, but we can default to inline for safety or double dollar for distinct blocks.
+            # If the parent is a paragraph or div by itself, maybe block.
+            # Let's try to detect current style. 
+            # GitBook often sets class 'katex-display' for block math.
+            is_display = 'katex-display' in k.get('class', []) or KATEX_DISPLAY.select_one(k)
+            
+            if is_display:
+                 k.replace_with(f"\n$$\n{latex_source}\n$$\n")
+            else:
+                 k.replace_with(f"${latex_source}$")
+        else:
+            # If no annotation, we might want to just unwrap or keep text?
+            # But typically the '.katex-html' part is what makes the garbage text.
+            # If we can't find source, proceed with care.
+            # Often removing .katex-html helps if there is a mathml fallback
+            pass
+
     def _html_to_text(self, element):
         """Convert HTML element to clean text with basic markdown formatting"""
         # This is a simple HTML to text converter
         # For production, you might want to use a proper HTML-to-markdown library
 
+        # One entry per output line, kept as fragments: inline text is appended to the
+        # last line's list and joined once at the end instead of re-concatenating per span
         text_lines = []
 
+        def line_is_open():
+            last = text_lines[-1]
+            # Merged fragments are stripped text, so only a single fragment can end a line
+            return len(last) > 1 or not last[0].endswith('\n')
+
+        def line_is_blank():
+            last = text_lines[-1]
+            return len(last) == 1 and not last[0].strip()
+
         def process_element(elem):
             if elem.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
                 level = int(elem.name[1])
                 heading = '#' * level + ' ' + elem.get_text().strip()
-                text_lines.append(heading)
-                text_lines.append('')
+                text_lines.append([heading])
+                text_lines.append([''])
             elif elem.name == 'p':
-                text_lines.append(elem.get_text().strip())
-                text_lines.append('')
+                text_lines.append([elem.get_text().strip()])
+                text_lines.append([''])
             elif elem.name in ['ul', 'ol']:
                 for li in elem.find_all('li', recursive=False):
-                    text_lines.append('- ' + li.get_text().strip())
-                text_lines.append('')
+                    text_lines.append(['- ' + li.get_text().strip()])
+                text_lines.append([''])
             elif elem.name == 'code':
-                text_lines.append('`' + elem.get_text().strip() + '`')
+                text_lines.append(['`' + elem.get_text().strip() + '`'])
             elif elem.name == 'pre':
                 code_text = elem.get_text().strip()
-                text_lines.append('```')
-                text_lines.append(code_text)
-                text_lines.append('```')
-                text_lines.append('')
+                text_lines.append(['```'])
+                text_lines.append([code_text])
+                text_lines.append(['```'])
+                text_lines.append([''])
             elif elem.name == 'img':
                 src = elem.get('src', '')
                 alt = elem.get('alt', 'image')
                 if src:
-                    text_lines.append(f"![{alt}]({src})")
-                    text_lines.append('')
+                    text_lines.append([f"![{alt}]({src})"])
+                    text_lines.append([''])
             elif elem.name in ['span', 'a', 'strong', 'em', 'b', 'i', 'sub', 'sup', 'small', 'math']:
                 # Handle inline elements by merging with previous text
                 text = elem.get_text(separator=' ').strip()
                 if text:
-                    if text_lines and not text_lines[-1].endswith('\n') and not text_lines[-1].strip() == '':
-                        text_lines[-1] += " " + text
+                    if text_lines and line_is_open() and not line_is_blank():
+                        text_lines[-1].append(text)
                     else:
-                        text_lines.append(text)
+                        text_lines.append([text])
             
             elif elem.name == 'table' or elem.get('role') in ['table', 'grid']:
-                text_lines.append('\n')
+                text_lines.append(['\n'])
                 # Find rows: standard <tr> or elements with role="row"
-                rows = elem.find_all(lambda t: t.name == 'tr' or t.get('role') == 'row', recursive=True)
+                # (plain walks over the tree: find_all() with a predicate is far slower on big tables)
+                rows = [t for t in elem.descendants if t.name == 'tr' or (t.name and t.get('role') == 'row')]
                 
                 table_data = []
                 max_cols = 0
                 for row in rows:
                     # Cells: <td>, <th> or role="cell", "columnheader"
-                    cells = row.find_all(lambda t: t.name in ['td', 'th'] or t.get('role') in ['cell', 'columnheader', 'gridcell'], recursive=False)
+                    cells = [c for c in row.children if _is_table_cell(c)]
                     if not cells: # Try one level deeper for complex structures
-                         cells = row.find_all(lambda t: t.name in ['td', 'th'] or t.get('role') in ['cell', 'columnheader', 'gridcell'], recursive=True)
+                         cells = [c for c in row.descendants if _is_table_cell(c)]
                     
                     if cells:
                         row_cells = [c.get_text(separator=' ').strip() for c in cells]
@@ -328,35 +399,53 @@ class ScrapingStrategy:
                 for i, row_cells in enumerate(table_data):
                     # Pad cells
                     padded = row_cells + [""] * (max_cols - len(row_cells))
-                    text_lines.append("| " + " | ".join(padded) + " |")
+                    text_lines.append(["| " + " | ".join(padded) + " |"])
                     # Simplified header detection: first row if it has 'th' or just first row overall
                     if i == 0:
-                        text_lines.append("| " + " | ".join(["---"] * max_cols) + " |")
-                text_lines.append('')
+                        text_lines.append(["| " + " | ".join(["---"] * max_cols) + " |"])
+                text_lines.append([''])
 
             else:
-                # For other elements (div, section, or unknown), recurse
-                for child in elem.children:
-                    if hasattr(child, 'name') and child.name:
-                        process_element(child)
-                    else:
-                        # Text node
-                        text = str(child).strip()
-                        if text:
-                             # Check if we should merge with previous line?
-                             # In a block container, text nodes often imply inline content too.
-                             if text_lines and not text_lines[-1].endswith('\n') and elem.name in ['div', 'li', 'td', 'th', 'p']:
-                                 text_lines[-1] += " " + text
-                             else:
-                                 text_lines.append(text)
-
+                # For other elements (div, section, or unknown), descend: children are
+                # visited by the loop below
+                stack.append((elem, iter(elem.children)))
+
+        # Containers are walked with an explicit stack of (container, children) rather than
+        # recursion, so deeply nested layouts cannot hit the recursion limit. A container's
+        # subtree is still finished before its next sibling (document order).
+        stack = []
         process_element(element)
+        while stack:
+            elem, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                continue
+            if hasattr(child, 'name') and child.name:
+                process_element(child)
+            else:
+                # Text node
+                text = str(child).strip()
+                if text:
+                     # Check if we should merge with previous line?
+                     # In a block container, text nodes often imply inline content too.
+                     if text_lines and line_is_open() and elem.name in ['div', 'li', 'td', 'th', 'p']:
+                         text_lines[-1].append(text)
+                     else:
+                         text_lines.append([text])
 
         # Join and clean up
-        result = '\n'.join(text_lines)
+        result = '\n'.join(' '.join(line) for line in text_lines)
 
         # Remove excessive blank lines
-        result = re.sub(r'\n{3,}', '\n\n', result)
+        result = _EXCESS_NEWLINES_RE.sub('\n\n', result)
+
+        # Pathological pages (huge generated tables, endless logs) are cut at the last
+        # paragraph boundary that fits
+        if len(result) > MAX_CONTENT_CHARS:
+            cut = result.rfind('\n\n', 0, MAX_CONTENT_CHARS)
+            result = result[:cut if cut > 0 else MAX_CONTENT_CHARS]
+            self.logger.debug(f"Truncated page text to {len(result)} characters")
 
         return result.strip()
 
@@ -368,59 +457,82 @@ class ScrapingStrategy:
             return []
 
         self.logger.info(f"🕷️ Starting Selenium scraper for {len(urls)} pages...")
-        pages = []
-        
-        # Setup driver
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        
-        driver = webdriver.Chrome(options=options)
-        
-        try:
-            for i, url in enumerate(urls):
-                try:
-                    if self.verbose:
-                        self.logger.info(f"📄 Scraping [{i+1}/{len(urls)}] {url}")
-                    
-                    driver.get(url)
-                    
-                    if progress_callback:
-                        progress_callback(i + 1, len(urls), f"Scraping {i+1}/{len(urls)}")
-                    
-                    # Wait for content to load
-                    try:
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, "main, article, .content"))
-                        )
-                    except:
-                        # Continue even if timeout, might be loaded already
-                        pass
+        if not urls:
+            return []
 
-                    
-                    # Small sleep for JS to finish
-                    await asyncio.sleep(2.0)
-                    
-                    html = driver.page_source
-                    content, parsed_title = self._extract_main_content(html)
-                    
-                    if content:
-                        pages.append({
-                            'title': parsed_title if parsed_title else driver.title,
-                            'url': url,
-                            'content': content,
-                            'source': 'selenium-spa',
-                            'html': html
-                        })
-                    else:
-                        self.logger.warning(f"⚠️ Empty content for {url}")
+        # Shared warm drivers (DriverManager) instead of launching a Chrome per call
+        pool = DriverManager().get_driver_pool(min(self.selenium_workers, len(urls)))
+        completed = 0
+
+        async def scrape(i, url):
+            nonlocal completed
+            driver = await pool.acquire()
+            try:
+                if self.verbose:
+                    self.logger.info(f"📄 Scraping [{i+1}/{len(urls)}] {url}")
+                return await asyncio.to_thread(self._scrape_rendered_page, driver, url)
+            except Exception as e:
+                self.logger.error(f"Error scraping {url}: {e}")
+                return None
+            finally:
+                pool.release(driver)
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, len(urls), f"Scraping {completed}/{len(urls)}")
+
+        results = await asyncio.gather(*(scrape(i, url) for i, url in enumerate(urls)))
+
+        # gather keeps input order, so pages stay in the order the URLs were given
+        return [page for page in results if page]
+
+    def _wait_for_settle(self, driver, timeout=2.0, interval=0.2):
+        """Poll the content length until two consecutive reads agree (or timeout)"""
+        deadline = time.monotonic() + timeout
+        last = None
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            try:
+                length = driver.execute_script(CONTENT_LENGTH_JS)
+            except Exception:
+                return
+            if length == last:
+                return
+            last = length
+
+    def _scrape_rendered_page(self, driver, url):
+        """Blocking page visit; runs in a worker thread with its own driver"""
+        driver.get(url)
+
+        # Wait for content to load
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "main, article, .content"))
+            )
+        except:
+            # Continue even if timeout, might be loaded already
+            pass
+
+        # Let the page's scripts finish instead of sleeping a fixed 2s
+        try:
+            WebDriverWait(driver, 5).until(
+                lambda d: d.execute_script("return document.readyState") == 'complete'
+            )
+        except:
+            pass
+        # Client-rendered content lands after the load event; wait for it to stop growing
+        self._wait_for_settle(driver)
+
+        html = driver.page_source
+        content, parsed_title = self._extract_main_content(html)
+
+        if not content:
+            self.logger.warning(f"⚠️ Empty content for {url}")
+            return None
 
-                except Exception as e:
-                    self.logger.error(f"Error scraping {url}: {e}")
-                    
-        finally:
-            driver.quit()
-            
-        return pages
+        return {
+            'title': parsed_title if parsed_title else driver.title,
+            'url': url,
+            'content': content,
+            'source': 'selenium-spa',
+            'html': html
+        }
@@ -4,10 +4,19 @@ Sitemap Strategy - Download pages listed in sitemap.xml
 
 import asyncio
 import aiohttp
+import io
 import re
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
+from lxml import etree
 from utils.logger import get_logger
+from utils.http_session import SharedSession
+from utils.rate_limiter import RateLimiter
+
+# Definite .md misses (404/410) a host may give without a single hit before .md probing
+# stops; throttling and server errors say nothing about whether markdown exists
+MD_MISS_LIMIT = 5
+MD_MISS_STATUSES = frozenset({404, 410})
 
 class SitemapStrategy:
     def __init__(self, max_concurrent=15, delay=0.1, timeout=30, verbose=False):
@@ -16,6 +25,16 @@ class SitemapStrategy:
         self.timeout = timeout
         self.verbose = verbose
         self.logger = get_logger()
+        # Connecting to a dead host fails fast; a stalled read cannot hold a slot past `timeout`
+        self._timeout = aiohttp.ClientTimeout(total=timeout, connect=min(10, timeout), sock_read=timeout)
+        self._http = SharedSession(self._timeout, limit=100, limit_per_host=max_concurrent)
+        # Sitemaps found per site root, so repeated runs skip the probes
+        self._sitemap_cache = {}
+        # Per host [.md hits, .md misses]: hosts without GitBook markdown stop getting .md requests
+        self._md_stats = {}
+
+    async def close(self):
+        await self._http.close()
 
     async def extract_pages(self, url, section_path=None):
         """Extract pages from sitemap.xml"""
@@ -55,51 +74,77 @@ class SitemapStrategy:
             '/sitemap_index.xml'
         ]
 
-        sitemaps = []
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-            for path in sitemap_paths:
-                sitemap_url = urljoin(base_url, path)
-                try:
-                    async with session.get(sitemap_url) as response:
-                        if response.status == 200:
-                            content = await response.text()
-                            if '<urlset' in content or '<sitemapindex' in content:
-                                sitemaps.append(sitemap_url)
-                                self.logger.debug(f"Found sitemap: {sitemap_url}")
-                except:
-                    continue
+        site_root = urljoin(base_url, '/')
+        if site_root in self._sitemap_cache:
+            return list(self._sitemap_cache[site_root])
+
+        session = await self._http.get()
+
+        async def probe(sitemap_url):
+            try:
+                # HEAD first: missing sitemaps and HTML catch-all pages cost no body download.
+                # Servers that reject HEAD (405/501) still get the GET below.
+                async with session.head(sitemap_url, allow_redirects=True) as response:
+                    if response.status not in (200, 405, 501):
+                        return None
+                    if response.status == 200 and 'html' in response.headers.get('Content-Type', '').lower():
+                        return None
+
+                async with session.get(sitemap_url) as response:
+                    if response.status == 200:
+                        content = await response.text()
+                        if '<urlset' in content or '<sitemapindex' in content:
+                            self.logger.debug(f"Found sitemap: {sitemap_url}")
+                            return sitemap_url
+            except:
+                pass
+            return None
+
+        # Candidates are probed concurrently; results keep the candidate order
+        found = await asyncio.gather(*(probe(urljoin(base_url, path)) for path in sitemap_paths))
+        sitemaps = [sitemap_url for sitemap_url in found if sitemap_url]
 
-        return sitemaps
+        self._sitemap_cache[site_root] = sitemaps
+        return list(sitemaps)
 
     async def _parse_sitemap(self, sitemap_url):
         """Parse sitemap XML and extract page URLs"""
         urls = []
 
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
-                async with session.get(sitemap_url) as response:
-                    if response.status != 200:
-                        return []
-
-                    content = await response.text()
-                    soup = BeautifulSoup(content, 'xml')
-
-                    # Handle sitemap index
-                    sitemap_tags = soup.find_all('sitemap')
-                    if sitemap_tags:
-                        # This is a sitemap index, recurse
-                        for sitemap_tag in sitemap_tags:
-                            loc = sitemap_tag.find('loc')
-                            if loc:
-                                child_urls = await self._parse_sitemap(loc.text)
-                                urls.extend(child_urls)
-                    else:
-                        # Regular sitemap with URLs
-                        url_tags = soup.find_all('url')
-                        for url_tag in url_tags:
-                            loc = url_tag.find('loc')
-                            if loc:
-                                urls.append(loc.text)
+            session = await self._http.get()
+            async with session.get(sitemap_url) as response:
+                if response.status != 200:
+                    return []
+
+                content = await response.read()
+
+            # Stream <loc> elements instead of building a tree: sitemaps can list 50k URLs
+            sitemap_locs = []
+            for _, loc in etree.iterparse(io.BytesIO(content), tag='{*}loc', recover=True):
+                entry = loc.getparent()
+                text = (loc.text or '').strip()
+                if text and entry is not None:
+                    # <sitemap><loc> in a sitemap index, <url><loc> in a regular sitemap
+                    kind = etree.QName(entry).localname
+                    if kind == 'sitemap':
+                        sitemap_locs.append(text)
+                    elif kind == 'url':
+                        urls.append(text)
+                # Drop finished entries so memory stays flat
+                loc.clear()
+                if entry is not None and entry.getparent() is not None:
+                    while entry.getprevious() is not None:
+                        del entry.getparent()[0]
+
+            if sitemap_locs:
+                # This is a sitemap index, recurse into all children concurrently
+                results = await asyncio.gather(*(self._parse_sitemap(child_url) for child_url in sitemap_locs),
+                                               return_exceptions=True)
+                urls = []
+                for child_urls in results:
+                    if isinstance(child_urls, list):
+                        urls.extend(child_urls)
 
         except Exception as e:
             self.logger.debug(f"Error parsing sitemap {sitemap_url}: {e}")
@@ -109,25 +154,34 @@ class SitemapStrategy:
     async def _download_pages(self, urls):
         """Download content from page URLs"""
         semaphore = asyncio.Semaphore(self.max_concurrent)
+        # Request starts are paced at max_concurrent/delay per second across all slots
+        limiter = RateLimiter(self.delay / self.max_concurrent)
         pages = []
 
         async def download_page(url):
             async with semaphore:
-                await asyncio.sleep(self.delay)
+                await limiter.wait()
 
                 try:
                     # Construct .md URL instead of HTML
                     md_url = url.rstrip('/') + '.md'
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(self.timeout)) as session:
+                    session = await self._http.get()
+                    md_stats = self._md_stats.setdefault(urlparse(url).netloc, [0, 0])
+                    # Keep probing until MD_MISS_LIMIT definite misses without a single hit
+                    if md_stats[0] or md_stats[1] < MD_MISS_LIMIT:
                         async with session.get(md_url) as response:
-                            if response.status == 200:
+                            if response.status != 200:
+                                if response.status in MD_MISS_STATUSES:
+                                    md_stats[1] += 1
+                            else:
+                                md_stats[0] += 1
                                 md = await response.text()
                                 title = self._extract_title(md)
                                 if not title:
                                     # Try to guess from URL if content title missing
                                     path = urlparse(url).path.strip('/')
                                     title = path.split('/')[-1].replace('-', ' ').title() if path else "Introduction"
-                                
+                            
                                 pages.append({
                                     'title': title,
                                     'url': md_url,
@@ -135,23 +189,23 @@ class SitemapStrategy:
                                     'source': 'sitemap-md'
                                 })
                                 return
-                        # Fallback to HTML if Markdown not available
-                        async with session.get(url) as response:
-                            if response.status == 200:
-                                html = await response.text()
-                                content = self._extract_content(html)
-                                if content:
-                                    title = self._extract_title(html)
-                                    if not title:
-                                        path = urlparse(url).path.strip('/')
-                                        title = path.split('/')[-1].replace('-', ' ').title() if path else "Introduction"
-                                    
-                                    pages.append({
-                                        'title': title,
-                                        'url': url,
-                                        'content': content,
-                                        'source': 'sitemap-html'
-                                    })
+                    # Fallback to HTML if Markdown not available
+                    async with session.get(url) as response:
+                        if response.status == 200:
+                            html = await response.text()
+                            content = self._extract_content(html)
+                            if content:
+                                title = self._extract_title(html)
+                                if not title:
+                                    path = urlparse(url).path.strip('/')
+                                    title = path.split('/')[-1].replace('-', ' ').title() if path else "Introduction"
+                                
+                                pages.append({
+                                    'title': title,
+                                    'url': url,
+                                    'content': content,
+                                    'source': 'sitemap-html'
+                                })
                 except Exception as e:
                     self.logger.debug(f"Error downloading {url}: {e}")
 
@@ -163,7 +217,7 @@ class SitemapStrategy:
 
     def _extract_content(self, html):
         """Extract main content from HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, 'lxml')
 
         # Remove unwanted elements
         for element in soup.select('nav, header, footer, .sidebar, .navigation'):
@@ -197,7 +251,7 @@ class SitemapStrategy:
         if md_match:
             return md_match.group(1).strip()
             
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, 'lxml')
 
         # Try various title sources
         title_selectors = [
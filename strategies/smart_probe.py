@@ -1,29 +1,43 @@
 
 import asyncio
 import aiohttp
+import hashlib
 import logging
+import time
 from typing import Dict, List, Optional, Set
-from urllib.parse import urlparse
+
+from utils.rate_limiter import HostRateLimiter, parse_retry_after
+from utils.url_utils import normalize_url, parse_url
 
 logger = logging.getLogger(__name__)
 
+# Confirmed misses are remembered this long (seconds); a page that was briefly down or
+# only just published gets probed again soon instead of staying missing for the cache TTL
+PROBE_MISS_TTL = 3600
+
 class SmartProbe:
     """
     Smart Native Probe Engine
     Attempts to download original Markdown sources directly, bypassing HTML parsing.
     """
     
-    def __init__(self, max_concurrent: int = 20, delay: float = 0.1):
+    def __init__(self, max_concurrent: int = 20, delay: float = 0.1, cache=None):
         self.max_concurrent = max_concurrent
         self.delay = delay
+        self.cache = cache  # Optional DiskCache: hits with their validators, recent misses
         self.semaphore = asyncio.Semaphore(max_concurrent)
+        # Paces candidate requests per host (max_concurrent/delay per second) and backs off on 429
+        self.rate_limiter = HostRateLimiter(delay / max_concurrent)
         self.session = None
+        self.no_head_hosts = set()  # Hosts that answered HEAD with 405/501: GET only
+        self.duplicates = {}  # url -> earlier url that served the same markdown
 
     async def probe_and_download(self, urls: List[str], progress_callback=None) -> Dict[str, str]:
         """
         Probes a list of URLs for their .md counterparts.
         Returns a dictionary of {url: markdown_content} for successful hits.
         """
+        urls = list(dict.fromkeys(urls))  # Probe each page once
         logger.info(f"🕵️ [SmartProbe] Probing {len(urls)} pages for native Markdown...")
         if progress_callback:
             progress_callback(0, len(urls), "Starting Smart Probe...")
@@ -31,34 +45,72 @@ class SmartProbe:
         results = {}
         timeout = aiohttp.ClientTimeout(total=10) # Fast timeout for probing
         
-        async with aiohttp.ClientSession(timeout=timeout) as session:
+        # Cap sockets per host as well, so probes of one GitBook don't burst past the semaphore
+        connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrent)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
             self.session = session
             
-            tasks = []
+            total = len(urls)
             completed_count = 0
+            # Workers pull URLs from a bounded queue, so pending work scales with
+            # max_concurrent rather than with the number of URLs
+            queue = asyncio.Queue(maxsize=self.max_concurrent * 4)
             
-            async def wrapped_probe(u):
+            async def produce():
+                for url in urls:
+                    await queue.put(url)
+                for _ in range(self.max_concurrent):
+                    await queue.put(None)  # One stop marker per worker
+            
+            async def work():
                 nonlocal completed_count
-                res = await self._probe_single(u)
-                completed_count += 1
-                if progress_callback:
-                    # Report periodically to avoid flooding
-                    if completed_count % 5 == 0 or completed_count == len(urls):
-                        progress_callback(completed_count, len(urls), f"Smart Probing: {completed_count}/{len(urls)}")
-                return res
-
-            for url in urls:
-                tasks.append(wrapped_probe(url))
-                
-            # Run in batches/concurrently
-            probed_results = await asyncio.gather(*tasks)
+                while True:
+                    url = await queue.get()
+                    if url is None:
+                        return
+                    url, content = await self._probe_single(url)
+                    if content:
+                        results[url] = content
+                    completed_count += 1
+            
+            async def report_progress():
+                # Coalesced: at most 10 callbacks a second, however fast probes finish
+                reported = 0
+                while True:
+                    await asyncio.sleep(0.1)
+                    if completed_count != reported:
+                        reported = completed_count
+                        progress_callback(reported, total, f"Smart Probing: {reported}/{total}")
             
-            for url, content in probed_results:
-                if content:
-                    results[url] = content
+            progress_task = asyncio.create_task(report_progress()) if progress_callback else None
+            try:
+                await asyncio.gather(produce(), *(work() for _ in range(self.max_concurrent)))
+            finally:
+                if progress_task:
+                    progress_task.cancel()
+            if progress_callback:
+                progress_callback(completed_count, total, f"Smart Probing: {completed_count}/{total}")
+            
+            # Hits arrive in completion order; hand them back in input order as before.
+            # URL variants serving identical markdown share the first one's string
+            ordered = {}
+            canonical = {}  # digest -> url
+            for url in urls:
+                content = results.get(url)
+                if content is None:
+                    continue
+                digest = hashlib.blake2b(content.encode('utf-8', 'ignore'), digest_size=16).digest()
+                first = canonical.setdefault(digest, url)
+                if first != url:
+                    self.duplicates[url] = first
+                    content = ordered[first]
+                ordered[url] = content
+            results = ordered
                     
         hit_rate = (len(results) / len(urls)) * 100 if urls else 0
         logger.info(f"🎯 [SmartProbe] Success: {len(results)}/{len(urls)} ({hit_rate:.1f}%) native files found.")
+        if self.duplicates:
+            logger.info(f"[SmartProbe] {len(self.duplicates)} hits duplicate another URL's content")
         return results
 
     async def _probe_single(self, url: str) ->(str, Optional[str]):
@@ -66,6 +118,69 @@ class SmartProbe:
         Try to fetch the .md version of a single URL.
         Returns (original_url, content_or_None).
         """
+        cache_key = self._cache_key(url)
+        entry = self.cache.get(cache_key, fresh=False) if self.cache else None
+        if isinstance(entry, dict):
+            if 'miss_at' in entry:
+                if time.time() - entry['miss_at'] < PROBE_MISS_TTL:
+                    return url, None
+            elif entry.get('etag') or entry.get('last_modified'):
+                content = await self._revalidate(cache_key, entry)
+                if content is not None:
+                    return url, content
+            elif self.cache.get(cache_key) is not None:
+                # No validators to revalidate with: reuse while within the cache TTL
+                return url, entry['content']
+
+        hit, definitive = await self._probe_network(url)
+        # Don't remember misses caused by timeouts/429s, only real answers
+        if self.cache:
+            if hit:
+                self.cache.set(cache_key, hit)
+            elif definitive:
+                self.cache.set(cache_key, {'miss_at': time.time()})
+        return url, hit['content'] if hit else None
+
+    async def _revalidate(self, cache_key: str, entry: Dict) -> Optional[str]:
+        """
+        Conditional GET of a cached hit. Returns its current content, or None if it is
+        gone and the page needs a full probe.
+        """
+        host = parse_url(entry['url']).netloc
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        async with self.semaphore:
+            try:
+                await self.rate_limiter.wait(host)
+                async with self.session.get(entry['url'], headers=headers) as response:
+                    if response.status == 304:
+                        self.rate_limiter.succeeded(host)
+                        self.cache.set(cache_key, entry)  # Restart its age
+                        return entry['content']
+                    if response.status == 200:
+                        self.rate_limiter.succeeded(host)
+                        hit = self._hit(entry['url'], await response.text(), response)
+                        if hit:
+                            self.cache.set(cache_key, hit)
+                        return hit['content'] if hit else None
+                    # 429/5xx say nothing about the page: keep serving the last good copy
+                    return None if self._settle(host, response) else entry['content']
+            except Exception:
+                return entry['content']
+
+    def _cache_key(self, url: str) -> str:
+        """Normalize URL so protocol/www/trailing-slash variants share an entry"""
+        return f"probe:{normalize_url(url)}"
+
+    async def _probe_network(self, url: str) ->(Optional[Dict], bool):
+        """
+        Fetch candidates over the network.
+        Returns (hit_or_None, definitive) where definitive is False if any candidate errored.
+        """
+        definitive = True
         async with self.semaphore:
             # Construct candidate URLs
             # 1. Direct append .md (common in some static hosts)
@@ -73,7 +188,6 @@ class SmartProbe:
             # The competitor simply appended .md. Let's try that first.
             
             # Clean URL first
-            parsed = urlparse(url)
             clean_url = url.split('#')[0].split('?')[0]
             
             # Heuristic: If it already ends in /, maybe add README.md? 
@@ -84,26 +198,68 @@ class SmartProbe:
                 f"{clean_url}.md",
                 f"{clean_url}/README.md" if not clean_url.endswith('.md') else None
             ]
-            candidates = [c for c in candidates if c]
-
-            for candidate in candidates:
-                try:
-                    await asyncio.sleep(self.delay)
-                    async with self.session.get(candidate) as response:
-                        if response.status == 200:
-                            # Verify if it looks like markdown
-                            content = await response.text()
-                            # Basic validation: Shouldn't start with <!DOCTYPE html>
-                            if content.strip().lower().startswith('<!doctype html'):
-                                continue
-                                
-                            return url, content
-                        
-                        elif response.status == 429:
-                            # Simple backoff handled by retry (omitted here for speed, just fail this probe)
-                            pass
-                            
-                except Exception as e:
-                    pass
             
-            return url, None
+            # Request candidates concurrently (the host limiter paces them) but keep their priority:
+            # a .md hit wins and the README request is dropped
+            tasks = [asyncio.create_task(self._fetch_candidate(c)) for c in candidates if c]
+            try:
+                for task in tasks:
+                    hit, ok = await task
+                    if hit:
+                        return hit, True
+                    definitive = definitive and ok
+            finally:
+                for task in tasks:
+                    task.cancel()
+            
+            return None, definitive
+
+    async def _fetch_candidate(self, candidate: str) ->(Optional[Dict], bool):
+        """
+        Fetch one candidate URL. Returns (hit_or_None, definitive).
+        A HEAD request screens out misses first, so 404 pages are never downloaded.
+        """
+        host = parse_url(candidate).netloc
+        try:
+            if host not in self.no_head_hosts:
+                await self.rate_limiter.wait(host)
+                async with self.session.head(candidate, allow_redirects=True) as response:
+                    if response.status in (405, 501):
+                        self.no_head_hosts.add(host)
+                    elif response.status != 200:
+                        return None, self._settle(host, response)
+                    elif 'html' in response.headers.get('Content-Type', '').lower():
+                        return None, True
+
+            await self.rate_limiter.wait(host)
+            async with self.session.get(candidate) as response:
+                if response.status == 200:
+                    self.rate_limiter.succeeded(host)
+                    return self._hit(candidate, await response.text(), response), True
+                
+                return None, self._settle(host, response)
+                    
+        except Exception as e:
+            return None, False
+
+    @staticmethod
+    def _hit(candidate: str, content: str, response) -> Optional[Dict]:
+        """Cache entry for a fetched candidate, or None if it isn't markdown"""
+        # Basic validation: Shouldn't start with <!DOCTYPE html>
+        if not content or content.strip().lower().startswith('<!doctype html'):
+            return None
+        return {
+            'url': candidate,
+            'content': content,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+
+    def _settle(self, host: str, response) -> bool:
+        """Handle a non-200 answer; returns whether the miss is definitive"""
+        if response.status == 429 or response.status >= 500:
+            # Not retried here (the miss isn't cached), but later probes of this host slow down
+            if response.status == 429:
+                self.rate_limiter.throttled(host, parse_retry_after(response.headers.get('Retry-After')))
+            return False
+        return True
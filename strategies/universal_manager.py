@@ -3,16 +3,29 @@ import asyncio
 import logging
 import re
 import xml.etree.ElementTree as ET
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urljoin
 import aiohttp
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Set
 import json
 import os
 
+from utils.url_utils import parse_url
+
 logger = logging.getLogger(__name__)
 
+ANCHOR_HREF_XPATH = etree.XPath("//a/@href", smart_strings=False)
+
+# Path of an absolute URL (what urlparse(url).path gives, without building a ParseResult)
+URL_PATH_RE = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*://[^/?#\s]*([^?#;\s]*)(?=[?#]|\Z)')
+
+TITLE_TRANS = str.maketrans('-_', '  ')
+
+# Auth pages and social links are never documentation
+URL_DENY_RE = re.compile(r'/(?:login|signup|signin|register)|twitter\.com|discord\.gg', re.IGNORECASE)
+
 @dataclass
 class UniversalNode:
     url: str
@@ -28,8 +41,9 @@ class UniversalManager:
     2. Heuristic DOM Scan (Fallback, robust but messy)
     """
 
-    def __init__(self, use_selenium=False):
+    def __init__(self, use_selenium=False, cache=None):
         self.use_selenium = use_selenium
+        self.cache = cache  # Optional DiskCache; sitemaps are revalidated with ETag/Last-Modified
         self.diagnostics = {
             "method": "unknown",
             "sitemap_found": False,
@@ -50,7 +64,8 @@ class UniversalManager:
         options.add_argument("--log-level=3")
         
         try:
-            driver = webdriver.Chrome(options=options)
+            # Chrome startup blocks for seconds; keep it off the event loop
+            driver = await asyncio.to_thread(webdriver.Chrome, options=options)
             return driver
         except Exception as e:
             logger.error(f"Failed to create Chrome driver: {e}")
@@ -87,10 +102,17 @@ class UniversalManager:
         logger.error("❌ [Universal] All strategies failed.")
         return []
 
-    async def _fetch_all_urls_from_sitemap(self, sitemap_url: str, seen_sitemaps: Set[str] = None) -> Set[str]:
+    async def _fetch_all_urls_from_sitemap(self, sitemap_url: str, seen_sitemaps: Set[str] = None,
+                                           session: Optional[aiohttp.ClientSession] = None) -> Set[str]:
         """
         Recursively fetch all URLs from a sitemap or sitemap index.
+        One pooled session serves the whole recursion, so child sitemaps reuse connections.
         """
+        if session is None:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, ttl_dns_cache=300)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                return await self._fetch_all_urls_from_sitemap(sitemap_url, seen_sitemaps, session)
+
         if seen_sitemaps is None:
             seen_sitemaps = set()
         
@@ -99,41 +121,94 @@ class UniversalManager:
         
         seen_sitemaps.add(sitemap_url)
         all_urls = set()
+        child_locs = []
+        child_tasks = []
+
+        def add_child(loc):
+            child_locs.append(loc)
+            child_tasks.append(asyncio.create_task(
+                self._fetch_all_urls_from_sitemap(loc, seen_sitemaps, session)))
+
+        # A previous run's copy is reused if the server answers 304 Not Modified
+        cache_key = f"sitemap:{sitemap_url}"
+        cached = self.cache.get(cache_key, fresh=False) if self.cache else None
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        # Streamed: entries are handled as their end tags arrive and then dropped, so memory
+        # stays at one entry instead of the whole document. Namespaces are ignored by
+        # matching local names ({ns}url -> url).
+        parser = ET.XMLPullParser(['start', 'end'])
+        root = None
+
+        def handle_events():
+            nonlocal root
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    continue
+                kind = elem.tag.rsplit('}', 1)[-1]
+                if kind not in ('sitemap', 'url'):
+                    continue
+                loc = elem.find('{*}loc')
+                if loc is not None and loc.text:
+                    # Case A: Sitemap Index - children are fetched while this file still streams
+                    if kind == 'sitemap':
+                        add_child(loc.text.strip())
+                    # Case B: Standard Sitemap
+                    else:
+                        all_urls.add(loc.text.strip())
+                root.clear()
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(sitemap_url, timeout=15) as resp:
-                    if resp.status != 200:
-                        return set()
-                    content = await resp.text()
+            async with session.get(sitemap_url, timeout=15, headers=headers) as resp:
+                if resp.status == 304 and cached:
+                    all_urls.update(cached['urls'])
+                    for loc in cached['sitemaps']:
+                        add_child(loc)  # Children revalidate themselves
+                    validators = None
+                elif resp.status != 200:
+                    return set()
+                else:
+                    async for chunk in resp.content.iter_chunked(65536):
+                        parser.feed(chunk)
+                        handle_events()
+                    parser.close()
+                    handle_events()
+                    validators = (resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
 
-            # Remove namespaces
-            content = re.sub(r'xmlns="[^"]+"', '', content, count=1)
-            try:
-                root = ET.fromstring(content)
-            except ET.ParseError:
-                return set()
+            if self.cache and validators and any(validators):
+                self.cache.set(cache_key, {
+                    'etag': validators[0],
+                    'last_modified': validators[1],
+                    'urls': sorted(all_urls),
+                    'sitemaps': child_locs
+                })
 
-            # Case A: Sitemap Index
-            if root.tag == 'sitemapindex':
-                locs = [loc.text.strip() for loc in root.findall(".//sitemap/loc") if loc.text]
-                tasks = [self._fetch_all_urls_from_sitemap(loc, seen_sitemaps) for loc in locs]
-                results = await asyncio.gather(*tasks)
-                for res in results:
-                    all_urls.update(res)
-            
-            # Case B: Standard Sitemap
-            else:
-                for loc in root.findall(".//url/loc"):
-                    if loc.text:
-                        all_urls.add(loc.text.strip())
+            for res in await asyncio.gather(*child_tasks):
+                all_urls.update(res)
                         
             return all_urls
                 
+        except ET.ParseError:
+            await self._cancel_all(child_tasks)
+            return set()
         except Exception as e:
+            await self._cancel_all(child_tasks)
             logger.error(f"Sitemap error for {sitemap_url}: {e}")
             return set()
 
+    async def _cancel_all(self, tasks):
+        """Cancel child fetches and wait for them, so none outlives the shared session"""
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
     async def _heuristic_scan(self, base_url: str) -> List[UniversalNode]:
         """
         Scan the main page for ALL internal links.
@@ -147,14 +222,16 @@ class UniversalManager:
             logger.info("Using Selenium for Heuristic Scan...")
             driver = await self._get_driver()
             if driver:
+                # WebDriver calls block, so each runs in a worker thread and the sitemap
+                # and probe tasks sharing this loop keep going meanwhile
                 try:
-                    driver.get(base_url)
+                    await asyncio.to_thread(driver.get, base_url)
                     # Wait a bit for sidebar to populate
                     await asyncio.sleep(5) 
                     
                     # Try to expand all details/summary if they exist (common in docs)
                     try:
-                        driver.execute_script("""
+                        await asyncio.to_thread(driver.execute_script, """
                             document.querySelectorAll('details').forEach((el) => el.open = true);
                             document.querySelectorAll('[aria-expanded="false"]').forEach((el) => el.click());
                         """)
@@ -162,13 +239,13 @@ class UniversalManager:
                     except:
                         pass
                     
-                    content = driver.page_source
-                    current_url = driver.current_url # Might have redirected
+                    content, current_url = await asyncio.to_thread(
+                        lambda: (driver.page_source, driver.current_url))  # Might have redirected
                 except Exception as e:
                     logger.error(f"Selenium scan failed: {e}")
                     # Fallthrough to aiohttp if selenium fails?
                 finally:
-                    driver.quit()
+                    await asyncio.to_thread(driver.quit)
         
         if not content:
             # Fallback to simple request (likely to miss JS content)
@@ -177,26 +254,28 @@ class UniversalManager:
                     content = await resp.text()
                     current_url = str(resp.url)
 
-        soup = BeautifulSoup(content, 'html.parser')
+        # Only the href strings are needed: one C-level parse and XPath, no tag objects
+        try:
+            hrefs = ANCHOR_HREF_XPATH(lxml_html.fromstring(content))
+        except (etree.ParserError, ValueError):
+            hrefs = []  # Empty document, or an XML encoding declaration lxml rejects in str input
         
         # Extract ALL links
         raw_links = set()
-        base_domain = urlparse(base_url).netloc
+        base_domain = parse_url(base_url).netloc
         
         # Broad filter: Find strict domain matches
-        all_anchors = soup.find_all('a', href=True)
-        self.diagnostics['heuristic_scan_details']['total_anchors'] = len(all_anchors)
+        self.diagnostics['heuristic_scan_details']['total_anchors'] = len(hrefs)
         
-        for a in all_anchors:
-            href = a['href']
+        for href in hrefs:
             full_url = urljoin(current_url, href)
-            parsed = urlparse(full_url)
+            parsed = parse_url(full_url)
             
             # Filter logic
             if parsed.netloc != base_domain:
                 continue # External link
             
-            if any(x in parsed.path.lower() for x in ['/login', '/signup', '/signin', '/register', 'twitter.com', 'discord.gg']):
+            if URL_DENY_RE.search(parsed.path):
                 continue
                 
             # Remove fragments for deduplication, unless it's a single page app where fragments matter? 
@@ -217,15 +296,17 @@ class UniversalManager:
         Convert flat list of URLs to hierarchical nodes based on path depth.
         """
         # Sort by length implies hierarchy (shorter is usually parent)
-        urls = sorted(list(set(urls)))
+        urls = sorted(set(urls))
         
         nodes = []
-        base_path_depth = len(urlparse(base_url).path.strip('/').split('/'))
-        if urlparse(base_url).path == '/' or not urlparse(base_url).path:
+        base_path = parse_url(base_url).path
+        base_path_depth = len(base_path.strip('/').split('/'))
+        if base_path == '/' or not base_path:
             base_path_depth = 0
 
         for url in urls:
-            path = urlparse(url).path.strip('/')
+            m = URL_PATH_RE.match(url)
+            path = (m.group(1) if m else parse_url(url).path).strip('/')
             parts = path.split('/')
             depth = len(parts) - base_path_depth
             
@@ -236,7 +317,7 @@ class UniversalManager:
             if not slug:
                 title = "Introduction"
             else:
-                title = slug.replace('-', ' ').replace('_', ' ').title()
+                title = slug.translate(TITLE_TRANS).title()
                 # If slug is just random characters or too short, maybe it's not a good title
                 # But for now this is better than "Untitled"
             
@@ -0,0 +1,84 @@
+import asyncio
+import io
+import random
+import re
+import unittest
+
+from utils.asset_downloader import AssetDownloader
+from utils.content_consolidator import ContentConsolidator, StreamingDocumentWriter
+
+DOWNLOADED_LINE_RE = re.compile(r'^\*\*Downloaded:\*\*.*$', re.MULTILINE)
+
+class TestStreamingDocumentWriter(unittest.TestCase):
+
+    def test_matches_post_processing(self):
+        consolidator = ContentConsolidator()
+        rng = random.Random(0)
+        tokens = ['text', 'x', ' ', '\t', '\n', '\n\n', '\n\n\n\n\n', ' \n \n\n\n', '## Sub']
+        for _ in range(5000):
+            chunks = [''.join(rng.choice(tokens) for _ in range(rng.randint(0, 6)))
+                      for _ in range(rng.randint(0, 8))]
+            out = io.StringIO()
+            writer = StreamingDocumentWriter(out)
+            for chunk in chunks:
+                writer.write(chunk)
+            writer.finish()
+            self.assertEqual(out.getvalue(), consolidator._post_process_content(''.join(chunks)),
+                             msg=repr(chunks))
+
+class TestConsolidatePages(unittest.TestCase):
+
+    def consolidate(self, pages, hierarchy_map=None, **kwargs):
+        consolidator = ContentConsolidator()
+        return asyncio.run(consolidator.consolidate_pages(
+            [dict(page) for page in pages], 'https://h/x', None, hierarchy_map, **kwargs
+        ))
+
+    def test_streaming_matches_string(self):
+        downloader = AssetDownloader()
+        rewrite = lambda text: downloader.update_asset_references(text, 'assets')
+        rng = random.Random(0)
+        tokens = ['# Title', '## Sub', 'text', 'Intro', 'README', '\n', '\n\n', '\n\n\n\n\n', '  ', '\t',
+                  ' \n \n\n\n', '![a](http://x/y.png)', '![b](c d.gif)']
+        for _ in range(2000):
+            pages = [{
+                'title': rng.choice(['Intro', 'Step 2', 'README', 'Guide', 'Untitled']),
+                'url': f"https://h/{rng.choice('abcde')}{rng.choice(['', '.md'])}",
+                'content': ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 12)))
+            } for _ in range(rng.randint(1, 8))]
+            hierarchy_map = None
+            if rng.random() < 0.5:
+                hierarchy_map = {
+                    f'https://h/{c}': {'order': i, 'level': rng.randint(0, 3), 'section': rng.choice([None, 'S1', 'S2'])}
+                    for i, c in enumerate('abcd')
+                }
+
+            document = rewrite(self.consolidate(pages, hierarchy_map))
+            out = io.StringIO()
+            self.assertIsNone(self.consolidate(pages, hierarchy_map, out_file=out, rewrite=rewrite))
+            # The header carries a timestamp to the second
+            self.assertEqual(DOWNLOADED_LINE_RE.sub('', out.getvalue()), DOWNLOADED_LINE_RE.sub('', document),
+                             msg=repr((pages, hierarchy_map)))
+
+    def test_duplicate_content_dropped(self):
+        long_a = 'a' * 100
+        long_b = 'b' * 100
+        pages = [
+            {'title': 'One', 'url': 'https://h/1', 'content': long_a},
+            {'title': 'Two', 'url': 'https://h/2', 'content': 'short'},
+            # Same length as the first page, different text: kept
+            {'title': 'Three', 'url': 'https://h/3', 'content': long_b},
+            # Exact copy of the first page of its length: dropped
+            {'title': 'Four', 'url': 'https://h/4', 'content': '  ' + long_a + '\n'},
+            {'title': 'Five', 'url': 'https://h/5', 'content': 'short'},
+            {'title': 'Six', 'url': 'https://h/6', 'content': long_b},
+        ]
+        document = self.consolidate(pages)
+        self.assertEqual(document.count(long_a), 1)
+        self.assertEqual(document.count(long_b), 1)
+        self.assertEqual(document.count('short'), 1)
+        for title in ('Four', 'Five', 'Six'):
+            self.assertNotIn(f'## {title}', document)
+
+if __name__ == '__main__':
+    unittest.main()
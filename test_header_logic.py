@@ -1,7 +1,10 @@
 
+import random
 import unittest
 import re
 
+from utils.content_consolidator import ContentConsolidator
+
 class ContentConsolidatorHeaders:
     """Mock class containing only the logic we want to test/implement"""
     
@@ -116,5 +119,52 @@ class TestHeaderLogic(unittest.TestCase):
         result = self.processor.adjust_headers(content, target_level_h2_based=2, page_title="Mixed")
         self.assertEqual(result.strip(), expected.strip())
 
+class TestProductionHeaders(unittest.TestCase):
+    """ContentConsolidator._adjust_headers against the reference implementation above"""
+
+    def setUp(self):
+        self.reference = ContentConsolidatorHeaders()
+        self.consolidator = ContentConsolidator()
+
+    @staticmethod
+    def header_levels(content):
+        matches = (re.match(r'^(#+)\s+(.*)', line) for line in content.split('\n'))
+        return [len(m.group(1)) for m in matches if m]
+
+    def expected(self, content, target_level, page_title):
+        levels = self.header_levels(content)
+        if not levels:
+            return content
+        result = self.reference.adjust_headers(content, target_level, page_title)
+        # Production has no special case for a removed H1 title: every page maps its top
+        # header level to target_level + 1, which the reference does one level up
+        if min(levels) == 1 and len(self.header_levels(result)) < len(levels):
+            result = self.reference.adjust_headers(content, target_level + 1, page_title)
+        # Production also tidies whitespace once it has rewritten any header
+        return self.consolidator._clean_whitespace(result)
+
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        tokens = ['#', '##', '###', ' ', '\t', '\r', '\n', '\n\n', '  ', 'x#',
+                  'Mission', 'The Mission', 'text', '# Mission', '## Goal']
+        for _ in range(5000):
+            content = ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 20)))
+            page_title = rng.choice(['Mission', 'Goal', 'text'])
+            target_level = rng.randint(1, 4)
+            self.assertEqual(
+                self.consolidator._adjust_headers(content, target_level, page_title),
+                self.expected(content, target_level, page_title),
+                msg=repr((content, target_level, page_title))
+            )
+
+    def test_no_headers_unchanged(self):
+        content = "  Plain text\n\n\n\nno headers  "
+        self.assertIs(self.consolidator._adjust_headers(content, 2, "Mission"), content)
+
+    def test_empty_title_is_not_a_dupe(self):
+        # Production only deduplicates against a real page title
+        result = self.consolidator._adjust_headers("# Intro\nText", 2, "")
+        self.assertEqual(result, "### Intro\nText")
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import random
+import tempfile
+import time
+import unittest
+from email.utils import formatdate
+from unittest import mock
+from urllib.parse import urlparse
+
+from utils.disk_cache import DiskCache
+from utils.rate_limiter import HostRateLimiter, RateLimiter, parse_retry_after
+from utils.url_utils import normalize_url, page_url, parse_url
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_starts_are_spaced(self):
+        async def run():
+            limiter = RateLimiter(0.05)
+            loop = asyncio.get_running_loop()
+            starts = []
+
+            async def task():
+                await limiter.wait()
+                starts.append(loop.time())
+
+            await asyncio.gather(*(task() for _ in range(4)))
+            return sorted(starts)
+
+        starts = asyncio.run(run())
+        # Callers arriving together get consecutive slots, not one shared delay
+        for earlier, later in zip(starts, starts[1:]):
+            self.assertGreaterEqual(later - earlier, 0.04)
+        self.assertLess(starts[-1] - starts[0], 0.5)
+
+    def test_zero_interval_does_not_wait(self):
+        async def run():
+            limiter = RateLimiter(0)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            for _ in range(100):
+                await limiter.wait()
+            return loop.time() - start
+
+        self.assertLess(asyncio.run(run()), 0.05)
+
+    def test_defer_holds_next_start(self):
+        async def run():
+            limiter = RateLimiter(0)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            limiter.defer(0.1)
+            await limiter.wait()
+            return loop.time() - start
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.09)
+
+class TestHostRateLimiter(unittest.TestCase):
+
+    def test_throttle_and_recover(self):
+        async def run():
+            limiter = HostRateLimiter(0.01, max_interval=1.0, recovery=1000)
+            limiter.throttled('a')
+            throttled = limiter._limiter('a').interval
+            for _ in range(10):
+                limiter.throttled('a')
+            capped = limiter._limiter('a').interval
+            other = limiter._limiter('b').interval
+            for _ in range(10):
+                limiter.succeeded('a')
+            return throttled, capped, other, limiter._limiter('a').interval
+
+        throttled, capped, other, recovered = asyncio.run(run())
+        self.assertEqual(throttled, 0.05)
+        self.assertEqual(capped, 1.0)
+        # Hosts are paced independently
+        self.assertEqual(other, 0.01)
+        self.assertEqual(recovered, 0.01)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertEqual(parse_retry_after(' 5 '), 5.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(''))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        future = parse_retry_after(formatdate(usegmt=True, timeval=time.time() + 30))
+        self.assertTrue(25 <= future <= 31)
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_round_trip(self):
+        cache = DiskCache(self.tmp.name)
+        self.assertIsNone(cache.get('missing'))
+        value = {'etag': '"abc"', 'urls': ['https://a/b'], 'n': 3}
+        cache.set('key', value)
+        self.assertEqual(cache.get('key'), value)
+        # A new instance on the same directory sees the entry
+        self.assertEqual(DiskCache(self.tmp.name).get('key'), value)
+
+    def test_expiry(self):
+        cache = DiskCache(self.tmp.name, ttl=60)
+        with mock.patch('utils.disk_cache.time.time', return_value=1000.0):
+            cache.set('key', 'value')
+        with mock.patch('utils.disk_cache.time.time', return_value=1059.0):
+            self.assertEqual(cache.get('key'), 'value')
+        with mock.patch('utils.disk_cache.time.time', return_value=1061.0):
+            self.assertIsNone(cache.get('key'))
+            # Expired entries stay available for revalidation
+            self.assertEqual(cache.get('key', fresh=False), 'value')
+
+    def test_corrupt_entry_is_a_miss(self):
+        cache = DiskCache(self.tmp.name)
+        cache.set('key', 'value')
+        cache._path('key').write_text('{not json', encoding='utf-8')
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', ['again'])
+        self.assertEqual(json.loads(cache._path('key').read_text(encoding='utf-8'))['value'], ['again'])
+
+class TestUrlUtils(unittest.TestCase):
+
+    def random_urls(self, count):
+        rng = random.Random(0)
+        tokens = ['https://', 'http://', 'www.', 'Docs.Example.com', '/', '//', 'guide', 'Intro',
+                  '?q=1', '#top', '#', '?', ';p', '.md', ':8080', ' ', '%20', 'a/b/']
+        for _ in range(count):
+            yield ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 10)))
+
+    def test_parse_url_matches_urlparse(self):
+        for url in self.random_urls(5000):
+            self.assertEqual(parse_url(url), urlparse(url), msg=repr(url))
+
+    def test_page_and_normalized_url(self):
+        for url in self.random_urls(5000):
+            # The inline forms these helpers replaced
+            page = url.split('#')[0].split('?')[0].rstrip('/')
+            self.assertEqual(page_url(url), page, msg=repr(url))
+            normalized = page.replace('https://', '').replace('http://', '').replace('www.', '').lower()
+            self.assertEqual(normalize_url(url), normalized, msg=repr(url))
+
+if __name__ == '__main__':
+    unittest.main()
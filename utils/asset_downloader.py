@@ -4,20 +4,37 @@ Asset Downloader - Downloads and manages images and other assets
 
 import asyncio
 import aiohttp
+import hashlib
 import re
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin
 from utils.logger import get_logger
+from utils.rate_limiter import HostRateLimiter, parse_retry_after
+from utils.url_utils import parse_url
+
+# One scan per page: markdown image/link targets, src attributes, href attributes (quoted or bare).
+# `](url)` is enough for markdown and also catches images nested inside links.
+ASSET_URL_RE = re.compile(
+    r'\]\((?P<md>[^)]+)\)'
+    r'|src\s*=\s*["\'](?P<src>[^"\']+)["\']'
+    r'|href\s*=\s*(?:["\'](?P<href>[^"\']*)["\']|(?P<bare>[^\s>]+))',
+    re.IGNORECASE
+)
+
+MAX_ASSET_BYTES = 100 * 1024 * 1024
+CHUNK_SIZE = 1 << 16
+
+ASSET_EXTENSIONS = frozenset({
+    'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'ico',
+    'pdf', 'zip', 'tar', 'gz'
+})
 
 class AssetDownloader:
     def __init__(self, verbose=False):
         self.verbose = verbose
         self.logger = get_logger()
 
-        self.asset_extensions = {
-            '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico',
-            '.pdf', '.zip', '.tar', '.gz'
-        }
+        self.asset_extensions = {f'.{ext}' for ext in ASSET_EXTENSIONS}
 
     async def download_assets(self, pages, assets_dir):
         """Download assets referenced in pages"""
@@ -40,19 +57,21 @@ class AssetDownloader:
         # Download assets
         downloaded_count = 0
         semaphore = asyncio.Semaphore(10)  # Limit concurrent downloads
+        rate_limiter = HostRateLimiter(0.01)  # Per-host pacing, slowed down by 429s
 
-        async def download_asset(url):
+        async def download_asset(session, url):
             nonlocal downloaded_count
 
             async with semaphore:
                 try:
-                    await asyncio.sleep(0.1)  # Rate limiting
-
                     # Determine filename
-                    parsed = urlparse(url)
+                    parsed = parse_url(url)
+                    host = parsed.netloc
                     filename = Path(parsed.path).name
+                    # Stable across runs (unlike hash()), so the exists() check below still applies
+                    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
                     if not filename or '.' not in filename:
-                        filename = f"asset_{hash(url) % 10000}"
+                        filename = f"asset_{digest}{Path(parsed.path).suffix}"
 
                     asset_path = assets_dir / filename
 
@@ -61,26 +80,45 @@ class AssetDownloader:
                         return
 
                     # Download
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(30)) as session:
-                        async with session.get(url) as response:
-                            if response.status == 200:
-                                content = await response.read()
-
-                                # Write file
-                                with open(asset_path, 'wb') as f:
-                                    f.write(content)
-
-                                downloaded_count += 1
-
-                                if self.verbose:
-                                    self.logger.debug(f"Downloaded: {filename}")
+                    await rate_limiter.wait(host)
+                    async with session.get(url) as response:
+                        if response.status == 429:
+                            rate_limiter.throttled(host, parse_retry_after(response.headers.get('Retry-After')))
+                        if response.status == 200:
+                            rate_limiter.succeeded(host)
+                            if (response.content_length or 0) > MAX_ASSET_BYTES:
+                                self.logger.debug(f"Skipping oversized asset: {url}")
+                                return
+
+                            # Stream to a temp file so an interrupted download never looks complete.
+                            # Per-URL name: uploads often share a basename (image.png), and two
+                            # downloads writing one temp file would interleave their chunks
+                            part_path = asset_path.with_name(f"{asset_path.name}.{digest}.part")
+                            size = 0
+                            try:
+                                with open(part_path, 'wb') as f:
+                                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                                        size += len(chunk)
+                                        if size > MAX_ASSET_BYTES:
+                                            raise ValueError("asset exceeds size limit")
+                                        await asyncio.to_thread(f.write, chunk)
+                                part_path.replace(asset_path)
+                            finally:
+                                part_path.unlink(missing_ok=True)
+
+                            downloaded_count += 1
+
+                            if self.verbose:
+                                self.logger.debug(f"Downloaded: {filename}")
 
                 except Exception as e:
                     self.logger.debug(f"Failed to download {url}: {e}")
 
-        # Download all assets
-        tasks = [download_asset(url) for url in asset_urls]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # Download all assets over one pooled session (assets mostly share a few CDN hosts)
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(30), connector=connector) as session:
+            tasks = [download_asset(session, url) for url in asset_urls]
+            await asyncio.gather(*tasks, return_exceptions=True)
 
         return downloaded_count
 
@@ -88,40 +126,22 @@ class AssetDownloader:
         """Extract asset URLs from content"""
         urls = set()
 
-        # Image patterns
-        img_patterns = [
-            r'!\[([^\]]*)\]\(([^)]+)\)',  # Markdown images
-            r'<img[^>]*src=["\']([^"\']+)["\'][^>]*>',  # HTML images
-            r'src\s*=\s*["\']([^"\']+)["\']',  # Generic src attributes
-        ]
-
-        # Link patterns for downloadable assets
-        link_patterns = [
-            r'\[([^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*)\]\(([^)]+)\)',  # Markdown links
-            r'href\s*=\s*(?:["\']([^"\']*)["\']|([^\s>]+))',  # HTML links
-        ]
-
-        all_patterns = img_patterns + link_patterns
-
-        for pattern in all_patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            for match in matches:
-                url = match.strip()
-
-                # Skip empty, anchor, or data URLs
-                if not url or url.startswith(('#', 'data:', 'javascript:')):
-                    continue
+        # Pages repeat the same links (nav, sidebar, footer); resolve each distinct one once
+        candidates = {match[match.lastgroup].strip() for match in ASSET_URL_RE.finditer(content)}
 
-                # Convert relative URLs to absolute
-                if base_url and not url.startswith(('http://', 'https://')):
-                    url = urljoin(base_url, url)
+        for url in candidates:
+            # Skip empty, anchor, or data URLs
+            if not url or url.startswith(('#', 'data:', 'javascript:')):
+                continue
 
-                # Check if it's an asset we want to download
-                parsed = urlparse(url)
-                path_lower = parsed.path.lower()
+            # Convert relative URLs to absolute
+            if base_url and not url.startswith(('http://', 'https://')):
+                url = urljoin(base_url, url)
 
-                if any(path_lower.endswith(ext) for ext in self.asset_extensions):
-                    urls.add(url)
+            # Check if it's an asset we want to download
+            path_lower = parse_url(url).path.lower()
+            if path_lower.rpartition('.')[2] in ASSET_EXTENSIONS:
+                urls.add(url)
 
         return urls
 
@@ -133,7 +153,7 @@ class AssetDownloader:
         # Replace image references
         def replace_image(match):
             original_url = match.group(1)
-            parsed = urlparse(original_url)
+            parsed = parse_url(original_url)
             filename = Path(parsed.path).name
 
             if filename and any(filename.lower().endswith(ext) for ext in self.asset_extensions):
@@ -2,79 +2,142 @@
 Content Consolidator - Combines pages into a single markdown document
 """
 
+import hashlib
+import io
 import re
-from datetime import datetime
+import time
 from pathlib import Path
+from urllib.parse import urlparse
 from utils.logger import get_logger
 
+# One header line; the trailing newline is captured so a removed header takes its line with it
+HEADER_LINE_RE = re.compile(r'^(#+)[^\S\n]+(.*)(\n?)', re.MULTILINE)
+PUNCT_RE = re.compile(r'[^\w\s]')
+# Same deletion as PUNCT_RE for ASCII text, done by str.translate
+ASCII_PUNCT_TRANS = str.maketrans('', '', ''.join(c for c in map(chr, range(128)) if PUNCT_RE.match(c)))
+NUMBER_RE = re.compile(r'\d+')
+EXCESS_BLANK_LINES_RE = re.compile(r'\n{4,}')
+# Title keywords for the heuristic sort (plain substring matches; 'intro' covers 'introduction')
+INTRO_TITLE_RE = re.compile(r'readme|intro|start|index')
+START_TITLE_RE = re.compile(r'getting started|quick start|overview')
+
+def strip_punctuation(text):
+    """Remove everything but word characters and whitespace"""
+    if text.isascii():
+        return text.translate(ASCII_PUNCT_TRANS)
+    return PUNCT_RE.sub('', text)
+
+class StreamingDocumentWriter:
+    """
+    Writes the document to a file as it is generated, applying the same cleanup as
+    _post_process_content. Trailing whitespace is held back until more text follows, so
+    blank-line runs are collapsed across writes and the end is trimmed exactly as before.
+    """
+
+    def __init__(self, out_file, rewrite=None):
+        self.out_file = out_file
+        self.rewrite = rewrite  # Optional per-chunk text transform (line-local, e.g. asset links)
+        self.pending = ''
+
+    def write(self, text):
+        text = self.pending + text
+        end = len(text.rstrip())
+        self.pending = text[end:]
+        if end:
+            chunk = EXCESS_BLANK_LINES_RE.sub('\n\n\n', text[:end])
+            if self.rewrite:
+                chunk = self.rewrite(chunk)
+            self.out_file.write(chunk)
+
+    def finish(self):
+        self.out_file.write('\n')
+
 class ContentConsolidator:
     def __init__(self, verbose=False):
         self.verbose = verbose
         self.logger = get_logger()
 
-    async def consolidate_pages(self, pages, base_url, section_path=None, hierarchy_map=None):
-        """Consolidate multiple page dicts into a single markdown file"""
+    async def consolidate_pages(self, pages, base_url, section_path=None, hierarchy_map=None,
+                                out_file=None, rewrite=None):
+        """
+        Consolidate multiple page dicts into a single markdown file.
+        Returns the document, or with out_file streams it there (after applying rewrite to
+        each chunk) and returns None, so the whole book is never held as one string.
+        """
         if not pages:
             return None
 
-        # Sort pages
+        # Sort pages; each page's hierarchy entry is resolved once and reused below
         self.hierarchy_map = hierarchy_map or {}
-        sorted_pages = self._sort_pages(pages)
+        page_infos = {id(page): self._page_info(page.get('url', '')) for page in pages}
+        sorted_pages = self._sort_pages(pages, page_infos)
 
-        # Generate document
-        content_parts = []
+        # Generate document: parts are written straight into the output (each followed by a
+        # newline) instead of being kept in a list until a final join
+        buf = StreamingDocumentWriter(out_file, rewrite) if out_file is not None else io.StringIO()
 
         # Add Header
         header = self._generate_header(base_url, section_path, len(sorted_pages))
-        content_parts.append(header)
+        buf.write(header)
+        buf.write("\n")
         last_section = None
         seen_content_hashes = set()
-        
-        import hashlib
+        # length -> first page of that length, fingerprinted only once a second one turns up
+        unhashed_by_length = {}
         
         for i, page in enumerate(sorted_pages, 1):
-            content = page.get('content', '').strip()
+            content = page.get('content', '')
+            # strip() copies the page; only pay for it when there is whitespace to remove
+            if content and (content[0].isspace() or content[-1].isspace()):
+                content = content.strip()
             if not content:
                 continue
                 
-            # Deduplication: check content hash
-            content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-            if content_hash in seen_content_hashes:
-                self.logger.debug(f"Skipping duplicate content for page: {page.get('title')}")
-                continue
-            seen_content_hashes.add(content_hash)
+            # Deduplication: a page can only repeat one of the same length, so most pages
+            # are never hashed. Short pages are their own key, longer ones are fingerprinted
+            # (raw digest bytes, no hex string)
+            length = len(content)
+            if length not in unhashed_by_length:
+                unhashed_by_length[length] = content
+            else:
+                first = unhashed_by_length[length]
+                if first is not None:
+                    seen_content_hashes.add(self._content_key(first))
+                    unhashed_by_length[length] = None
+                content_hash = self._content_key(content)
+                if content_hash in seen_content_hashes:
+                    self.logger.debug(f"Skipping duplicate content for page: {page.get('title')}")
+                    continue
+                seen_content_hashes.add(content_hash)
 
             # Check for generic section break
-            url = page.get('url', '')
+            info = page_infos[id(page)]
             section_title = None
-            if self.hierarchy_map:
-                info = self.hierarchy_map.get(url)
-                if not info and url.endswith('.md'):
-                    info = self.hierarchy_map.get(url[:-3])
-                
-                if info and info.get('section'):
-                    section_title = info['section']
+            if info and info.get('section'):
+                section_title = info['section']
             
             # Inject section header if changed
             if section_title and section_title != last_section:
-                content_parts.append(f"\n## {section_title}\n")
+                buf.write(f"\n## {section_title}\n\n")
                 last_section = section_title
             
-            page_content = self._process_page_content(page, i)
+            page_content = self._process_page_content(page, i, info)
             if page_content:
-                content_parts.append(page_content)
-                content_parts.append("\n---\n")
+                buf.write(page_content)
+                buf.write("\n\n---\n\n")
+
+        if out_file is not None:
+            buf.finish()
+            return None
 
-        # Combine and clean up
-        final_content = "\n".join(content_parts)
+        # Combine and clean up (the trailing newline is trimmed by post-processing)
+        final_content = buf.getvalue()
         final_content = self._post_process_content(final_content)
 
         return final_content
 
     def _generate_header(self, base_url, section_path, page_count):
         """Generate document header"""
-        from urllib.parse import urlparse
-
         domain = urlparse(base_url).netloc
         title = domain.replace('.gitbook.io', '').replace('.com', '').title()
 
@@ -87,7 +150,7 @@ class ContentConsolidator:
 
 **Source:** {base_url}  
 **Pages:** {page_count}  
-**Downloaded:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}  
+**Downloaded:** {time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime())}  
 """
 
         if section_path:
@@ -97,7 +160,26 @@ class ContentConsolidator:
 
         return header
 
-    def _sort_pages(self, pages):
+    @staticmethod
+    def _content_key(content):
+        """Dedup key for page content: the text itself if short, else a blake2b digest"""
+        if len(content) < 64:
+            return content
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+    def _page_info(self, url):
+        """Hierarchy entry for a page URL, or None"""
+        if not self.hierarchy_map:
+            return None
+        # hierarchy_map keys are cleaned absolute URLs; try exact match first
+        info = self.hierarchy_map.get(url)
+        
+        # If content URL might be .md but hierarchy has clean URL
+        if not info and url.endswith('.md'):
+            info = self.hierarchy_map.get(url[:-3])
+        return info
+
+    def _sort_pages(self, pages, page_infos):
         """Sort pages in logical reading order based on hierarchy or heuristics"""
         
         def sort_key(page):
@@ -106,16 +188,7 @@ class ContentConsolidator:
             
             # Check hierarchy first
             if self.hierarchy_map:
-                # Need to match URL loosely (ignore protocol/www) to be robust
-                # But hierarchy_map keys are cleaned absolute URLs
-                # Let's try exact match first
-                info = self.hierarchy_map.get(url) 
-                
-                # If content URL might be .md but hierarchy has clean URL
-                if not info and url.endswith('.md'):
-                     clean_u = url[:-3] # remove .md
-                     info = self.hierarchy_map.get(clean_u)
-                     
+                info = page_infos[id(page)]
                 if info:
                     # Primary sort: Order index from sidebar
                     return (info['order'], 0)
@@ -125,24 +198,23 @@ class ContentConsolidator:
             
             # Fallback to heuristic sort
             score = 0
-            if any(word in title for word in ['readme', 'introduction', 'intro', 'start', 'index']):
+            if INTRO_TITLE_RE.search(title):
                 score += 1000
-            if any(word in title for word in ['getting started', 'quick start', 'overview']):
+            if START_TITLE_RE.search(title):
                 score += 900
             
-            import re
-            numeric_match = re.search(r'(\d+)', title)
+            numeric_match = NUMBER_RE.search(title)
             if numeric_match:
-                score += 800 - int(numeric_match.group(1))
+                score += 800 - int(numeric_match.group())
 
             score += max(0, 100 - len(title.split()))
-            score += max(0, 50 - len(url.split('/')))
+            score += max(0, 50 - (url.count('/') + 1))
 
             return (0, -score)
 
         return sorted(pages, key=sort_key)
 
-    def _process_page_content(self, page, page_num):
+    def _process_page_content(self, page, page_num, info=None):
         """Process individual page content with smart header adjustment"""
         title = page['title']
         # Clean title suffix (e.g. " | Nado Docs")
@@ -150,7 +222,6 @@ class ContentConsolidator:
             title = title.split('|')[0].strip()
             
         content = page.get('content', '')
-        url = page.get('url', '')
         
         if not content or not content.strip():
             self.logger.warning(f"Empty content for page: {title}")
@@ -164,18 +235,12 @@ class ContentConsolidator:
         
         target_h2_level = 2 # Default to H2 
         
-        if self.hierarchy_map:
-            info = self.hierarchy_map.get(url)
-            # Try removing extension if not found
-            if not info and url.endswith('.md'):
-                 info = self.hierarchy_map.get(url[:-3])
-            
-            if info:
-                # Calculate level relative to document root. 
-                # Sidebar root items are usually level 1 (inside first UL).
-                # We want them to be H2.
-                # So: Level 1 -> H2. Offset +1.
-                target_h2_level = info['level'] + 1
+        if info:
+            # Calculate level relative to document root. 
+            # Sidebar root items are usually level 1 (inside first UL).
+            # We want them to be H2.
+            # So: Level 1 -> H2. Offset +1.
+            target_h2_level = info['level'] + 1
 
         # 1. Clean and Adjust Headers
         # We need to demote the headers inside the content so they fit UNDER the new page title.
@@ -202,22 +267,14 @@ class ContentConsolidator:
         Adjust headers in content to fit into the target hierarchy using smart demotion & deduplication.
         Ported from test_header_logic.py
         """
-        lines = content.split('\n')
-        
-        # 1. Analyze content structure
-        min_header_level = 99
-        first_header_index = -1
-        first_header_text = ""
+        # A header line needs a '#'; most pages without one skip the regex entirely
+        if '#' not in content:
+            return content
         
-        import re
-        for i, line in enumerate(lines):
-            match = re.match(r'^(#+)\s+(.*)', line)
-            if match:
-                level = len(match.group(1))
-                min_header_level = min(min_header_level, level)
-                if first_header_index == -1:
-                    first_header_index = i
-                    first_header_text = match.group(2).strip()
+        # 1. Analyze content structure: the one regex pass; the matches also drive the rewrite
+        headers = list(HEADER_LINE_RE.finditer(content))
+        min_header_level = min((len(m.group(1)) for m in headers), default=99)
+        first_header_text = headers[0].group(2).strip() if headers else None
         
         if min_header_level == 99:
             # No headers, just return text
@@ -226,9 +283,9 @@ class ContentConsolidator:
         # 2. Check deduplication for the FIRST header only
         # If the first header found matches the page_title we are about to insert, mark it for removal
         is_dupe = False
-        if first_header_index != -1 and page_title:
-            clean_text = re.sub(r'[^\w\s]', '', first_header_text.lower())
-            clean_title = re.sub(r'[^\w\s]', '', page_title.lower())
+        if page_title:
+            clean_text = strip_punctuation(first_header_text.lower())
+            clean_title = strip_punctuation(page_title.lower())
             # Expanded fuzzy match
             if clean_text == clean_title or clean_title in clean_text or clean_text in clean_title:
                 is_dupe = True
@@ -279,35 +336,31 @@ class ContentConsolidator:
         
         shift = desired_base_level - min_header_level
         
-        # 4. Process lines
-        processed_lines = []
-        header_count = 0
-        for i, line in enumerate(lines):
-            match = re.match(r'^(#+)\s+(.*)', line)
-            if match:
-                level = len(match.group(1))
-                text = match.group(2).strip()
-                header_count += 1
-                
-                # Deduplication removal (only remove the very first header if it matches)
-                if header_count == 1 and is_dupe:
-                    continue
-                
-                new_level = max(1, level + shift)
-                processed_lines.append(f"{'#' * new_level} {text}")
-            else:
-                processed_lines.append(line)
+        # 4. Rewrite header lines in place; everything else is left untouched
+        parts = []
+        pos = 0
+        for i, match in enumerate(headers):
+            parts.append(content[pos:match.start()])
+            pos = match.end()
+            
+            # Deduplication removal (only remove the very first header if it matches)
+            if i == 0 and is_dupe:
+                continue
+            
+            new_level = max(1, len(match.group(1)) + shift)
+            parts.append(f"{'#' * new_level} {match.group(2).strip()}{match.group(3)}")
+        parts.append(content[pos:])
         
-        result_text = '\n'.join(processed_lines)
+        result_text = ''.join(parts)
         return self._clean_whitespace(result_text)
 
     def _clean_whitespace(self, content):
-        content = re.sub(r'\n{4,}', '\n\n\n', content)
+        content = EXCESS_BLANK_LINES_RE.sub('\n\n\n', content)
         return content.strip()
 
     def _post_process_content(self, content):
         """Final post-processing of the complete document"""
-        content = re.sub(r'\n{4,}', '\n\n\n', content)
+        content = EXCESS_BLANK_LINES_RE.sub('\n\n\n', content)
         content = content.rstrip() + '\n'
         return content
 
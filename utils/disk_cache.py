@@ -0,0 +1,47 @@
+"""
+Disk Cache - Persistent key/value store for results reused across runs
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from utils.logger import get_logger
+
+class DiskCache:
+    def __init__(self, cache_dir, ttl=None, verbose=False):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl  # seconds, None = never expire
+        self.verbose = verbose
+        self.logger = get_logger()
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+
+    def get(self, key, fresh=True):
+        """
+        Return the cached value for key, or None if missing/expired.
+        fresh=False also returns expired entries (for values revalidated with the server).
+        """
+        try:
+            entry = json.loads(self._path(key).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+        if fresh and self.ttl is not None and time.time() - entry.get('time', 0) > self.ttl:
+            return None
+        return entry.get('value')
+
+    def set(self, key, value):
+        """Store a JSON-serializable value for key"""
+        path = self._path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a crash never leaves a half-written entry
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps({'key': key, 'time': time.time(), 'value': value}), encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.debug(f"Cache write failed for {key}: {e}")
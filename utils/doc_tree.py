@@ -0,0 +1,31 @@
+"""
+Doc Tree - Lightweight node type for the semantic sidebar hierarchy
+"""
+
+class DocNode:
+    """One sidebar entry; directories are nodes without a url"""
+    # No per-instance __dict__: sidebars can hold thousands of nodes
+    __slots__ = ('title', 'url', 'level', 'children')
+
+    def __init__(self, title, level=0, url=None):
+        self.title = title
+        self.url = url
+        self.level = level
+        self.children = []
+
+    def add_child(self, node):
+        self.children.append(node)
+
+    def to_dict(self):
+        """JSON-serializable form of this subtree"""
+        return {'title': self.title, 'url': self.url, 'level': self.level,
+                'children': [child.to_dict() for child in self.children]}
+
+    @classmethod
+    def from_dict(cls, data):
+        node = cls(data['title'], data['level'], data['url'])
+        node.children = [cls.from_dict(child) for child in data['children']]
+        return node
+
+    def __repr__(self):
+        return f"DocNode({self.title!r}, level={self.level}, url={self.url!r})"
@@ -0,0 +1,119 @@
+"""
+Driver Manager - Shared headless Chrome instances for DOM-driven strategies
+"""
+
+import asyncio
+import atexit
+import queue
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from utils.logger import get_logger
+
+class DriverPool:
+    """Hands out a fixed set of drivers to concurrent async workers"""
+
+    def __init__(self, drivers):
+        self.drivers = list(drivers)
+        self._queue = asyncio.Queue()
+        for driver in self.drivers:
+            self._queue.put_nowait(driver)
+
+    async def acquire(self):
+        return await self._queue.get()
+
+    def release(self, driver):
+        self._queue.put_nowait(driver)
+
+class DriverManager:
+    """
+    Process-wide singleton: every DriverManager() returns the same manager,
+    so all callers share one warm Chrome instead of launching their own.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance.logger = get_logger()
+                # Per profile (lightweight or not): main driver and extra pool workers
+                instance._drivers = {}
+                instance._workers = {}
+                # Idle drivers for blocking callers (checkout/checkin), reused across jobs
+                instance._idle = queue.Queue(maxsize=4)
+                atexit.register(instance.quit_all)
+                cls._instance = instance
+        return cls._instance
+
+    def _create_driver(self, lightweight=False):
+        options = Options()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        # Suppress logs
+        options.add_argument('--log-level=3')
+        options.add_argument('--window-size=1920,1080')
+        if lightweight:
+            # Sidebar and breadcrumb reads only need the DOM: return on DOMContentLoaded
+            # (callers wait for their selectors) and never fetch images. Content scraping
+            # keeps the default profile, which waits for the full page.
+            options.page_load_strategy = 'eager'
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_argument('--disable-extensions')
+            options.add_argument('--disable-gpu')
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        return webdriver.Chrome(options=options)
+
+    def get_driver(self, lightweight=False):
+        """The shared main driver of a profile, launched on first use"""
+        if self._drivers.get(lightweight) is None:
+            self._drivers[lightweight] = self._create_driver(lightweight)
+        return self._drivers[lightweight]
+
+    def get_driver_pool(self, size, lightweight=False):
+        """Pool of `size` drivers; the profile's main driver is reused as the first worker"""
+        size = max(1, size)
+        workers = self._workers.setdefault(lightweight, [])
+        while len(workers) < size - 1:
+            workers.append(self._create_driver(lightweight))
+        return DriverPool([self.get_driver(lightweight)] + workers[:size - 1])
+
+    def checkout(self):
+        """Idle pooled driver for a blocking (threaded) job, or a freshly launched one"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._create_driver()
+
+    def checkin(self, driver):
+        """Reset a driver's session state and park it for the next job (quit if the pool is full)"""
+        try:
+            driver.delete_all_cookies()
+            driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            self._idle.put_nowait(driver)
+            return
+        except queue.Full:
+            pass
+        except Exception as e:
+            self.logger.debug(f"Dropping driver that failed to reset: {e}")
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.debug(f"Error closing driver: {e}")
+
+    def quit_all(self):
+        idle = []
+        while not self._idle.empty():
+            idle.append(self._idle.get_nowait())
+        workers = [driver for drivers in self._workers.values() for driver in drivers]
+        for driver in list(self._drivers.values()) + workers + idle:
+            if driver is None:
+                continue
+            try:
+                driver.quit()
+            except Exception as e:
+                self.logger.debug(f"Error closing driver: {e}")
+        self._drivers = {}
+        self._workers = {}
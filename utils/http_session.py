@@ -0,0 +1,29 @@
+"""
+HTTP Session - Lazily opened keep-alive aiohttp session shared by a strategy's requests
+"""
+
+import aiohttp
+
+class SharedSession:
+    """
+    One aiohttp.ClientSession per owner, opened on first use and reopened after close().
+    Pages are fetched from a handful of hosts: reusing connections avoids paying a
+    TCP/TLS handshake per request.
+    """
+
+    def __init__(self, timeout=None, **connector_options):
+        self.timeout = timeout
+        self.connector_options = {'ttl_dns_cache': 300, **connector_options}
+        self._session = None
+
+    async def get(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(**self.connector_options)
+            kwargs = {'timeout': self.timeout} if self.timeout else {}
+            self._session = aiohttp.ClientSession(connector=connector, **kwargs)
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,26 @@
+"""
+PDF Export - Renders a library markdown file to PDF bytes
+
+Kept free of import-time side effects so it can run in worker processes.
+"""
+
+import io
+from pathlib import Path
+
+def render_pdf(path_str):
+    """PDF bytes for a markdown file; raises RuntimeError if conversion fails"""
+    import markdown
+    from xhtml2pdf import pisa
+
+    md_content = Path(path_str).read_text(encoding='utf-8')
+
+    # Convert MD to HTML
+    html_content = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
+
+    # Generate PDF
+    pdf_buffer = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html_content, dest=pdf_buffer)
+
+    if pisa_status.err:
+        raise RuntimeError("PDF generation failed")
+    return pdf_buffer.getvalue()
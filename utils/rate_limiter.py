@@ -0,0 +1,81 @@
+"""
+Rate Limiter - Paces request starts shared by concurrent download tasks
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+class RateLimiter:
+    """
+    Lets at most one request start per `interval` seconds across all tasks.
+    Waiters are handed consecutive start slots, so N tasks arriving together
+    start `interval` apart instead of each sleeping a full delay.
+    """
+
+    def __init__(self, interval):
+        self.interval = max(0.0, interval)
+        self._next_start = 0.0
+
+    async def wait(self):
+        """Sleep until this caller's start slot"""
+        now = asyncio.get_running_loop().time()
+        if not self.interval and self._next_start <= now:
+            return
+        start = max(now, self._next_start)
+        # Reserve the slot before sleeping: no await between the read and the write
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def defer(self, seconds):
+        """Hold every start for at least `seconds` from now"""
+        resume = asyncio.get_running_loop().time() + seconds
+        self._next_start = max(self._next_start, resume)
+
+class HostRateLimiter:
+    """
+    One RateLimiter per host that adapts to the server (AIMD): a 429 pauses the host
+    for its Retry-After and halves its request rate, each success adds back a little.
+    """
+
+    def __init__(self, interval, max_interval=5.0, recovery=1.0):
+        self.base_interval = max(0.0, interval)
+        self.max_interval = max_interval
+        self.recovery = recovery  # requests/second regained per success
+        self._limiters = {}
+
+    def _limiter(self, host):
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = RateLimiter(self.base_interval)
+        return limiter
+
+    async def wait(self, host):
+        await self._limiter(host).wait()
+
+    def throttled(self, host, retry_after=None):
+        """The host answered 429: back off"""
+        limiter = self._limiter(host)
+        limiter.interval = min(self.max_interval, max(limiter.interval * 2, 0.05))
+        # Capped so a bogus header can't stall the run; jitter so waiters don't all resume at once
+        limiter.defer(min(retry_after or 0, 60) + random.uniform(0, 0.5))
+
+    def succeeded(self, host):
+        limiter = self._limiter(host)
+        if limiter.interval > self.base_interval:
+            rate = 1 / limiter.interval + self.recovery
+            limiter.interval = max(self.base_interval, 1 / rate)
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,21 @@
+"""
+URL helpers shared by the downloader, strategies and consolidator
+"""
+
+import functools
+from urllib.parse import urlparse
+
+@functools.lru_cache(maxsize=1 << 16)
+def parse_url(url):
+    """Memoized urlparse: the same page URLs are parsed again by each stage"""
+    return urlparse(url)
+
+@functools.lru_cache(maxsize=None)
+def page_url(url):
+    """Fetchable page key: drop fragment/query and trailing slash"""
+    return url.split('#', 1)[0].split('?', 1)[0].rstrip('/')
+
+@functools.lru_cache(maxsize=None)
+def normalize_url(url):
+    """Dedup key: drop fragment/query, protocol, www. and trailing slash, lowercase"""
+    return page_url(url).replace('https://', '').replace('http://', '').replace('www.', '').lower()
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import glob
+import re
 import sys
 import time
 from pathlib import Path
@@ -8,55 +10,78 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
-import subprocess
+from utils.pdf_export import render_pdf
 import threading
 import json
 import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Setup Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("web_server")
 
+SOURCE_RE = re.compile(r'\*\*Source:\*\* (https?://\S+)')
+
 # Simple in-memory task store
 # { task_id: { status: 'running'|'completed'|'failed', progress: ..., result: ... } }
 tasks = {}
+TASK_LOG_LINES = 2000  # Only the latest lines of each task's log are kept
+TASK_RETENTION = 30 * 60  # Finished tasks are dropped after this many seconds
+JSON_SINK_PREFIX = b"JSON-SINK:"  # Structured progress lines from the downloader's stdout
+
+@asynccontextmanager
+async def lifespan(app):
+    """App startup and shutdown, in one place and a fixed order"""
+    # Filesystem setup happens here, not at import: PDF worker processes started with
+    # spawn re-import this module and must not migrate files themselves
+    templates_dir.mkdir(exist_ok=True)
+    LIBRARY_DIR.mkdir(exist_ok=True)
+    # Run migration on startup
+    migrate_root_files()
+    # Held here: the loop only keeps weak references to tasks
+    eviction_task = asyncio.create_task(evict_finished_tasks())
+    try:
+        yield
+    finally:
+        eviction_task.cancel()
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(cancel_futures=True)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Setup templates
 # Setup templates
 templates_dir = Path(__file__).parent / "templates"
-templates_dir.mkdir(exist_ok=True)
 templates = Jinja2Templates(directory=str(templates_dir))
 
 # Setup Library Directory
 LIBRARY_DIR = Path(__file__).parent / "library"
-LIBRARY_DIR.mkdir(exist_ok=True)
 
 def migrate_root_files():
     """Move .md files from root to library"""
     root_dir = Path(__file__).parent
     count = 0
-    for f in glob.glob(str(root_dir / "*.md")):
+    with os.scandir(root_dir) as it:
+        candidates = [e for e in it if e.name.endswith('.md') and not e.name.startswith('.') and e.is_file()]
+    for entry in candidates:
         # Skip README.md and other specific files if needed, but user wants clean root
-        if "README" in f or "CHANGELOG" in f:
+        if "README" in entry.name or "CHANGELOG" in entry.name:
              continue
              
-        src = Path(f)
-        dst = LIBRARY_DIR / src.name
+        dst = LIBRARY_DIR / entry.name
+        # rename() would replace an existing file on POSIX, so the check stays
         if not dst.exists():
             try:
-                src.rename(dst)
+                os.rename(entry.path, dst)
                 count += 1
             except Exception as e:
-                logger.error(f"Failed to move {src.name}: {e}")
+                logger.error(f"Failed to move {entry.name}: {e}")
     if count > 0:
         logger.info(f"📦 Migrated {count} files to library/")
 
-# Run migration on startup
-migrate_root_files()
-
 class DownloadRequest(BaseModel):
     url: str
     filename: str = ""
@@ -65,10 +90,10 @@ class DownloadRequest(BaseModel):
     filter_include: str = ""
     filter_exclude: str = ""
 
-def run_download_task(task_id: str, req: DownloadRequest):
+async def run_download_task(task_id: str, req: DownloadRequest):
     """Background task to run the download process"""
     tasks[task_id]['status'] = 'running'
-    tasks[task_id]['log'] = []
+    tasks[task_id]['log'] = deque(maxlen=TASK_LOG_LINES)
     
     # Construct command
     cmd = [sys.executable, "main.py", req.url]
@@ -100,28 +125,24 @@ def run_download_task(task_id: str, req: DownloadRequest):
     if req.filter_exclude:
         cmd.extend(["--exclude", req.filter_exclude])
         
-    # Run process
+    # Run process (asyncio subprocess: output is read on the event loop, no thread per task)
+    process = None
     try:
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT, 
-            text=True, 
-            encoding='utf-8',
-            cwd=os.path.dirname(os.path.abspath(__file__))
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            limit=1 << 20  # Longest accepted output line
         )
         
         # Stream output to log
-        for line in process.stdout:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check for JSON-SINK message
-            if line.startswith("JSON-SINK:"):
+        async for raw in process.stdout:
+            # Check for JSON-SINK message on the raw bytes: json.loads takes bytes and
+            # skips the surrounding whitespace, so sink lines are never decoded or stripped
+            if raw.startswith(JSON_SINK_PREFIX):
                 try:
-                    json_str = line[10:].strip()
-                    data = json.loads(json_str)
+                    data = json.loads(raw[len(JSON_SINK_PREFIX):])
                     # Update task progress data
                     if 'type' in data:
                         if data['type'] == 'progress':
@@ -136,10 +157,13 @@ def run_download_task(task_id: str, req: DownloadRequest):
                          pass
                 except Exception as e:
                     print(f"Error parsing JSON sink: {e}")
-            else:
+                continue
+            
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if line:
                 tasks[task_id]['log'].append(line)
             
-        process.wait()
+        await process.wait()
         
         if process.returncode == 0:
             tasks[task_id]['status'] = 'completed'
@@ -155,6 +179,21 @@ def run_download_task(task_id: str, req: DownloadRequest):
     except Exception as e:
         tasks[task_id]['status'] = 'failed'
         tasks[task_id]['error'] = str(e)
+    finally:
+        # Reading stopped early (e.g. a line over the limit): the child would block on a full pipe
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        tasks[task_id]['end_time'] = time.time()
+
+async def evict_finished_tasks():
+    """Periodically forget tasks that finished more than TASK_RETENTION seconds ago"""
+    while True:
+        await asyncio.sleep(300)
+        cutoff = time.time() - TASK_RETENTION
+        for task_id, task in list(tasks.items()):
+            if task.get('status') in ('completed', 'failed') and task.get('end_time', cutoff) < cutoff:
+                del tasks[task_id]
 
 @app.post("/api/download")
 async def start_download(req: DownloadRequest, background_tasks: BackgroundTasks):
@@ -169,51 +208,63 @@ async def start_download(req: DownloadRequest, background_tasks: BackgroundTasks
 
 @app.get("/api/status/{task_id}")
 async def get_task_status(task_id: str):
-    return tasks.get(task_id, {"status": "not_found"})
+    task = tasks.get(task_id)
+    if task is None:
+        return {"status": "not_found"}
+    return {**task, "log": list(task.get('log', ()))}
+
+def _read_metadata(entry):
+    """Title/source/size metadata for one library file, or None if it can't be read"""
+    f = Path(entry.path)
+    try:
+        stat = entry.stat()
+        # Try to read first few lines for metadata (the header block, not the whole book;
+        # 2 KB covers at least 500 characters of any UTF-8 text)
+        with f.open('rb') as fh:
+            content_preview = fh.read(2048).decode('utf-8', errors='ignore')
+        
+        # Simple metadata extraction
+        title = f.name
+        source = "Unknown"
+        
+        # Heuristic: Find first H1
+        for line in content_preview.splitlines():
+            if line.startswith("# "):
+                title = line[2:].strip()
+                break
+        
+        # Heuristic: Find Source line
+        if '**Source:**' in content_preview:
+            match = SOURCE_RE.search(content_preview)
+            if match:
+                source = match.group(1)
+
+        return {
+            "filename": f.name,
+            "title": title,
+            "source": source,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "created": stat.st_ctime
+        }
+    except Exception as e:
+        print(f"Error reading {f}: {e}")
+        return None
 
 @app.get("/api/history")
 async def get_history():
     """Get list of downloaded files with metadata from LIBRARY folder"""
-    files = []
-    # Scan library directory
-    md_files = list(LIBRARY_DIR.glob("*.md"))
+    # Scan library directory (scandir entries cache their stat result)
+    with os.scandir(LIBRARY_DIR) as it:
+        md_entries = [e for e in it if e.name.endswith('.md') and e.is_file()]
     # DEBUG: Scanning
     try:
-        print(f"Scanning {LIBRARY_DIR}, found {len(md_files)} .md files")
+        print(f"Scanning {LIBRARY_DIR}, found {len(md_entries)} .md files")
     except: pass
     
-    for f in md_files:
-        try:
-            stat = f.stat()
-            # Try to read first few lines for metadata
-            content_preview = f.read_text(encoding='utf-8', errors='ignore')[:500]
-            
-            # Simple metadata extraction
-            title = f.name
-            source = "Unknown"
-            
-            # Heuristic: Find first H1
-            for line in content_preview.splitlines():
-                if line.startswith("# "):
-                    title = line[2:].strip()
-                    break
-            
-            # Heuristic: Find Source line
-            import re
-            match = re.search(r'\*\*Source:\*\* (https?://\S+)', content_preview)
-            if match:
-                source = match.group(1)
-
-            files.append({
-                "filename": f.name,
-                "title": title,
-                "source": source,
-                "size": stat.st_size,
-                "modified": stat.st_mtime,
-                "created": stat.st_ctime
-            })
-        except Exception as e:
-            print(f"Error reading {f}: {e}")
+    # File reads run in worker threads so the event loop keeps serving other requests
+    results = await asyncio.gather(*(asyncio.to_thread(_read_metadata, entry) for entry in md_entries))
+    files = [meta for meta in results if meta is not None]
             
     # Sort files: recently modified first
     files.sort(key=lambda x: x['modified'], reverse=True)
@@ -248,14 +299,54 @@ async def get_content(filename: str):
     except Exception as e:
         return {"error": str(e)}
 
+# xhtml2pdf is pure Python and CPU-bound: renders run in worker processes so the event
+# loop keeps serving. Finished PDFs are kept on disk, keyed by the book's (mtime, size),
+# and concurrent requests for the same book share one render.
+PDF_CACHE_DIR = LIBRARY_DIR / ".pdf_cache"
+PDF_WORKERS = min(2, os.cpu_count() or 1)
+_pdf_pool = None
+_pdf_renders = {}  # cache path -> in-flight render task
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+def _store_pdf(file_path, cached, pdf_bytes):
+    """Write a rendered PDF into the cache, dropping older renders of the same book"""
+    PDF_CACHE_DIR.mkdir(exist_ok=True)
+    for stale in PDF_CACHE_DIR.glob(f"{glob.escape(file_path.name)}.*.pdf"):
+        if stale.name.rsplit('.', 3)[0] == file_path.name:
+            stale.unlink(missing_ok=True)
+    part = cached.with_name(cached.name + '.part')
+    part.write_bytes(pdf_bytes)
+    os.replace(part, cached)
+
+async def _render_to_cache(file_path, cached):
+    loop = asyncio.get_running_loop()
+    pdf_bytes = await loop.run_in_executor(_get_pdf_pool(), render_pdf, str(file_path))
+    await asyncio.to_thread(_store_pdf, file_path, cached, pdf_bytes)
+    return cached
+
+async def _render_pdf(file_path):
+    """Path of the cached PDF for a library file, rendering it first if needed"""
+    st = file_path.stat()
+    cached = PDF_CACHE_DIR / f"{file_path.name}.{st.st_mtime_ns}.{st.st_size}.pdf"
+    if cached.exists():
+        return cached
+    task = _pdf_renders.get(cached)
+    if task is None:
+        task = _pdf_renders[cached] = asyncio.ensure_future(_render_to_cache(file_path, cached))
+        task.add_done_callback(lambda _: _pdf_renders.pop(cached, None))
+    # One client disconnecting must not cancel the render the others are waiting on
+    return await asyncio.shield(task)
+
 @app.get("/api/download_pdf/{filename}")
 async def download_pdf_endpoint(filename: str):
     """Convert a markdown file to PDF and return it"""
     try:
-        from fastapi.responses import StreamingResponse
-        import markdown
-        from xhtml2pdf import pisa
-        import io
+        from fastapi.responses import FileResponse
 
         if ".." in filename or "/" in filename or "\\" in filename:
             return {"error": "Invalid filename"}
@@ -263,45 +354,14 @@ async def download_pdf_endpoint(filename: str):
         file_path = LIBRARY_DIR / filename
         if not file_path.exists():
             return {"error": "File not found"}
-            
-        md_content = file_path.read_text(encoding='utf-8')
-        
-        # Convert MD to HTML
-        html_content = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
         
-        # Add basic styling for PDF
-        full_html = f"""
-        <html>
-        <head>
-            <style>
-                @page {{ size: A4; margin: 2cm; }}
-                body {{ font-family: sans-serif; font-size: 10pt; line-height: 1.5; }}
-                h1, h2, h3 {{ color: #333; }}
-                code {{ background-color: #f0f0f0; padding: 2px; }}
-                pre {{ background-color: #f5f5f5; padding: 10px; border: 1px solid #ddd; word-wrap: break-word; white-space: pre-wrap; }}
-                img {{ max-width: 100%; height: auto; }}
-                table {{ width: 100%; border-collapse: collapse; margin-bottom: 1em; }}
-                th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                th {{ background-color: #f2f2f2; }}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
-        
-        # Generate PDF
-        pdf_buffer = io.BytesIO()
-        pisa_status = pisa.CreatePDF(html_content, dest=pdf_buffer)
-        
-        if pisa_status.err:
-            return {"error": "PDF generation failed"}
-            
-        pdf_buffer.seek(0)
+        try:
+            pdf_path = await _render_pdf(file_path)
+        except RuntimeError as e:
+            return {"error": str(e)}
         
-        return StreamingResponse(
-            pdf_buffer, 
+        return FileResponse(
+            pdf_path, 
             media_type="application/pdf", 
             headers={"Content-Disposition": f"attachment; filename={filename.replace('.md', '.pdf')}"}
         )